@@ -8,21 +8,64 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+from functools import lru_cache
+import atexit
+import logging
+import logging.handlers
 import os
+import queue
 
-load_dotenv()
+# Local development origins always allowed alongside FRONTEND_URL
+DEFAULT_CORS_ORIGINS = (
+    'http://localhost:8080',
+    'http://localhost:8081',
+    'http://localhost:3000',
+    'http://localhost:5173'
+)
+
+
+@lru_cache(maxsize=1)
+def _load_env():
+    """Parse the .env file once per process"""
+    load_dotenv()
+
+
+_load_env()
+
+
+@lru_cache(maxsize=1)
+def _configure_logging():
+    """Route log records through a queue so request threads never block on I/O"""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, logging.StreamHandler(), respect_handler_level=True)
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
 
 
 def create_app():
     """Application factory pattern"""
+    _load_env()
+    _configure_logging()
     app = Flask(__name__)
 
+    # Serialize every jsonify() response with orjson
+    from utils.json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
+
     # Configuration
     app.config['SECRET_KEY'] = os.getenv(
         'SECRET_KEY', 'luna-photoclinometry-secret-key')
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
     app.config['UPLOAD_FOLDER'] = 'uploads'
     app.config['RESULTS_FOLDER'] = 'server_results'
+    # Let a fronting nginx/Apache stream result files via X-Sendfile
+    app.config['USE_X_SENDFILE'] = os.getenv(
+        'USE_X_SENDFILE', 'false').lower() == 'true'
 
     # JWT Configuration
     app.config['JWT_SECRET_KEY'] = os.getenv(
@@ -55,13 +98,8 @@ def create_app():
 
     # CORS Configuration with explicit settings
     CORS(app,
-         origins=[
-             os.getenv('FRONTEND_URL', 'http://localhost:3000'),
-             'http://localhost:8080',
-             'http://localhost:8081',
-             'http://localhost:3000',
-             'http://localhost:5173'
-         ],
+         origins=[os.getenv('FRONTEND_URL', 'http://localhost:3000'),
+                  *DEFAULT_CORS_ORIGINS],
          supports_credentials=True,
          allow_headers=['Content-Type', 'Authorization'],
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
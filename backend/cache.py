@@ -0,0 +1,99 @@
+"""
+In-process read cache for processing results, user statistics and users
+"""
+
+import os
+import threading
+from cachetools import TTLCache
+
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '60'))
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '2048'))
+USER_STATS_TTL = int(os.getenv('USER_STATS_TTL', '300'))
+# Invalidation only reaches the current process, so keep user entries short
+# enough that other gunicorn workers see profile changes and deletions soon
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+
+# result_id -> document, and job_id -> result_id pointer
+_results = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+_job_results = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+# user_id -> per-status result counts
+_user_stats = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=USER_STATS_TTL)
+# user_id -> stored user fields, for authenticated request lookups
+_users = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_lock = threading.Lock()
+
+
+def get_result(result_id: str):
+    """Return a copy of the cached document, or None on a miss"""
+    with _lock:
+        doc = _results.get(result_id)
+    return dict(doc) if doc is not None else None
+
+
+def get_result_by_job(job_id: str):
+    """Return a copy of the cached document for a job, or None on a miss"""
+    with _lock:
+        result_id = _job_results.get(job_id)
+        doc = _results.get(result_id) if result_id is not None else None
+    return dict(doc) if doc is not None else None
+
+
+def set_result(doc: dict):
+    """Cache a serialized result document under its ID and job ID"""
+    result_id = doc.get('_id')
+    if not result_id:
+        return
+    with _lock:
+        _results[result_id] = dict(doc)
+        if doc.get('job_id'):
+            _job_results[doc['job_id']] = result_id
+
+
+def invalidate_result(result_id, job_id: str = None):
+    """Drop a result document (and optionally its job pointer) from the cache"""
+    with _lock:
+        _results.pop(str(result_id), None)
+        if job_id:
+            _job_results.pop(job_id, None)
+
+
+def get_user_stats(user_id: str):
+    """Return a copy of the cached statistics for a user, or None on a miss"""
+    with _lock:
+        stats = _user_stats.get(user_id)
+    return dict(stats) if stats is not None else None
+
+
+def set_user_stats(user_id: str, stats: dict):
+    """Cache a user's statistics"""
+    with _lock:
+        _user_stats[user_id] = dict(stats)
+
+
+def invalidate_user_stats(user_id: str):
+    """Drop a user's statistics after one of their results changes status"""
+    if user_id:
+        with _lock:
+            _user_stats.pop(user_id, None)
+
+
+def get_user(user_id: str):
+    """Return the cached user fields, or None on a miss"""
+    with _lock:
+        return _users.get(user_id)
+
+
+def set_user(user_id: str, user_fields: tuple):
+    """Cache a user's stored fields"""
+    with _lock:
+        _users[user_id] = user_fields
+
+
+def invalidate_user(user_id=None):
+    """Drop one user, or every user when no ID is given"""
+    with _lock:
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(str(user_id), None)
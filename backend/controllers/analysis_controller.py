@@ -4,50 +4,90 @@ Analysis controller for quality analysis and metrics
 
 import os
 import json
+from functools import lru_cache
+import orjson
 from flask import current_app, jsonify
 
 from models.job import JobStatus, job_storage
 from utils.helpers import get_job_directory
 
 
+def _file_mtime(path: str):
+    """Return the file's modification time in ns, or None if it is missing"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=256)
+def _load_report_files(report_file: str, report_mtime, json_file: str, json_mtime) -> dict:
+    """Read the report files once per (path, mtime) so repeat polls skip disk and parsing"""
+    report_data = {}
+
+    # Read text report
+    if report_mtime is not None:
+        try:
+            with open(report_file, 'rb') as f:
+                report_data["text_report"] = f.read().decode('utf-8', 'replace')
+        except Exception as e:
+            report_data["text_report_error"] = str(e)
+
+    # Read JSON analysis
+    if json_mtime is not None:
+        try:
+            with open(json_file, 'rb') as f:
+                raw = f.read()
+            try:
+                report_data["detailed_analysis"] = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                # json.dump writes NaN/Infinity tokens that orjson rejects
+                report_data["detailed_analysis"] = json.loads(raw)
+        except Exception as e:
+            report_data["json_analysis_error"] = str(e)
+
+    return report_data
+
+
 class AnalysisController:
     """Handle quality analysis and metrics"""
 
     @staticmethod
     def get_quality_analysis(job_id: str):
         """Get detailed quality analysis"""
-        if job_id not in job_storage:
+        snapshot = job_storage.snapshot(job_id)
+        if snapshot is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
-        if job.status != JobStatus.COMPLETED:
+        status, results = snapshot
+        if status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
-        if not job.results:
+        if not results:
             return jsonify({"error": "Analysis not available"}), 404
 
         return jsonify({
             "job_id": job_id,
-            "quality_analysis": job.results["analysis_results"],
-            "processing_info": job.results["processing_info"]
+            "quality_analysis": results["analysis_results"],
+            "processing_info": results["processing_info"]
         })
 
     @staticmethod
     def get_surface_metrics(job_id: str):
         """Get surface analysis metrics"""
-        if job_id not in job_storage:
+        snapshot = job_storage.snapshot(job_id)
+        if snapshot is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
-        if job.status != JobStatus.COMPLETED:
+        status, results = snapshot
+        if status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
-        if not job.results:
+        if not results:
             return jsonify({"error": "Analysis not available"}), 404
 
-        analysis = job.results["analysis_results"]
+        analysis = results.get("analysis_results", {})
+        mission_metrics = analysis.get("mission_metrics", {})
 
         return jsonify({
             "job_id": job_id,
@@ -55,26 +95,26 @@ class AnalysisController:
                 "elevation_stats": analysis.get("basic_stats", {}),
                 "slope_analysis": analysis.get("gradient_stats", {}),
                 "roughness_metrics": analysis.get("roughness_stats", {}),
-                "mission_metrics": analysis.get("mission_metrics", {}),
+                "mission_metrics": mission_metrics,
                 "quality_score": analysis.get("quality_score", 0)
             },
             "terrain_classification": {
-                "crater_features": analysis.get("mission_metrics", {}).get("crater_candidates", 0),
-                "ridge_features": analysis.get("mission_metrics", {}).get("ridge_features", 0),
-                "flat_terrain_percent": analysis.get("mission_metrics", {}).get("flat_terrain_percent", 0),
-                "landing_sites": analysis.get("mission_metrics", {}).get("suitable_landing_sites", 0)
+                "crater_features": mission_metrics.get("crater_candidates", 0),
+                "ridge_features": mission_metrics.get("ridge_features", 0),
+                "flat_terrain_percent": mission_metrics.get("flat_terrain_percent", 0),
+                "landing_sites": mission_metrics.get("suitable_landing_sites", 0)
             }
         })
 
     @staticmethod
     def get_analysis_report(job_id: str):
         """Get formatted analysis report"""
-        if job_id not in job_storage:
+        snapshot = job_storage.snapshot(job_id)
+        if snapshot is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
-        if job.status != JobStatus.COMPLETED:
+        status, results = snapshot
+        if status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
         # Try to read the analysis report file
@@ -85,23 +125,11 @@ class AnalysisController:
         report_file = os.path.join(analysis_dir, "analysis_report.txt")
         json_file = os.path.join(analysis_dir, "detailed_analysis.json")
 
+        # Cached on modification time, so rewritten files are picked up
         response_data = {"job_id": job_id}
-
-        # Read text report
-        if os.path.exists(report_file):
-            try:
-                with open(report_file, 'r', encoding='utf-8') as f:
-                    response_data["text_report"] = f.read()
-            except Exception as e:
-                response_data["text_report_error"] = str(e)
-
-        # Read JSON analysis
-        if os.path.exists(json_file):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    response_data["detailed_analysis"] = json.load(f)
-            except Exception as e:
-                response_data["json_analysis_error"] = str(e)
+        response_data.update(_load_report_files(
+            report_file, _file_mtime(report_file),
+            json_file, _file_mtime(json_file)))
 
         if "text_report" not in response_data and "detailed_analysis" not in response_data:
             return jsonify({"error": "Analysis report files not found"}), 404
@@ -111,12 +139,12 @@ class AnalysisController:
     @staticmethod
     def compare_with_reference(job_id: str):
         """Compare results with reference data (placeholder for future feature)"""
-        if job_id not in job_storage:
+        snapshot = job_storage.snapshot(job_id)
+        if snapshot is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
-        if job.status != JobStatus.COMPLETED:
+        status, results = snapshot
+        if status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
         # This is a placeholder for future reference comparison functionality
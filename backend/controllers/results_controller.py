@@ -3,14 +3,101 @@ Results controller for handling results retrieval and downloads
 """
 
 import os
-from flask import current_app, jsonify, send_file, request
+import logging
+from functools import lru_cache
+from flask import current_app, jsonify, send_file, request, stream_with_context
+from werkzeug.wsgi import FileWrapper
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from PIL import Image
 import mimetypes
 
 from models.job import JobStatus, job_storage
 from models.processing_result import ProcessingResult
-from utils.helpers import get_job_directory
+from utils.helpers import get_job_directory, scan_files, build_file_index
+
+logger = logging.getLogger(__name__)
+
+# Load the MIME type tables once at import instead of on first lookup
+mimetypes.init()
+
+
+# File category by the first letter of the MIME top-level type
+_FILE_TYPES = {'i': "image", 'a': "data", 't': "text"}
+
+BYTES_PER_MB = 1024 * 1024
+
+
+@lru_cache(maxsize=64)
+def _mime_for_ext(ext: str):
+    """Return (mime_type, file_type) for a file extension"""
+    mime_type = mimetypes.types_map.get(ext.lower()) or mimetypes.guess_type('x' + ext)[0]
+    file_type = _FILE_TYPES.get(mime_type[0], "unknown") if mime_type else "unknown"
+    return mime_type, file_type
+
+
+# Read size for streaming large archives; 128x fewer reads than the 8 KiB default
+LARGE_FILE_BLOCK_SIZE = 1 << 20
+
+
+def _send_large_file(file_path: str, download_name: str, mimetype: str):
+    """Stream a large attachment in 1 MiB blocks, preferring the server's sendfile wrapper"""
+    if current_app.config.get('USE_X_SENDFILE'):
+        # The fronting web server does the copy; nothing to stream here
+        return send_file(file_path, mimetype=mimetype, as_attachment=True,
+                         download_name=download_name,
+                         conditional=True, etag=True, max_age=0)
+
+    stat = os.stat(file_path)
+    f = open(file_path, 'rb')
+    file_wrapper = request.environ.get('wsgi.file_wrapper', FileWrapper)
+    response = current_app.response_class(
+        file_wrapper(f, LARGE_FILE_BLOCK_SIZE), mimetype=mimetype,
+        direct_passthrough=True)
+    response.call_on_close(f.close)
+    response.content_length = stat.st_size
+    response.last_modified = stat.st_mtime
+    response.headers.set('Content-Disposition', 'attachment',
+                         filename=download_name)
+    response.set_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    response.cache_control.public = True
+    response.cache_control.max_age = 0
+    return response.make_conditional(request, accept_ranges=True,
+                                     complete_length=stat.st_size)
+
+
+def _find_file(job, job_dir: str, filename: str):
+    """Look filename up in the job's file index, rescanning the directory on a miss"""
+    file_index = job.file_index
+    if file_index is None or filename not in file_index:
+        file_index = build_file_index(job_dir)
+        job.file_index = file_index
+    return file_index.get(filename)
+
+
+# Leading-byte signatures of the image formats the pipeline produces
+_IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+
+def _image_mimetype(path: str):
+    """Sniff the file's magic bytes and return its image MIME type, or None"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+    except OSError:
+        return None
+    for signature, mimetype in _IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return mimetype
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
 
 
 class ResultsController:
@@ -19,27 +106,29 @@ class ResultsController:
     @staticmethod
     def get_results_summary(job_id: str):
         """Get comprehensive processing results"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         if job.status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
         if not job.results:
             return jsonify({"error": "Results not available"}), 404
 
-        return jsonify(job.results)
+        # Completed results never change, so encode them once per job
+        body = job.results_cache
+        if body is None:
+            body = job.results_cache = jsonify(job.results).get_data()
+        return current_app.response_class(body, mimetype='application/json')
 
     @staticmethod
     def download_results(job_id: str):
         """Download complete results as ZIP file"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         if job.status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
@@ -51,16 +140,17 @@ class ResultsController:
         if not os.path.exists(zip_path):
             return jsonify({"error": "Results file not found"}), 404
 
-        return send_file(zip_path, as_attachment=True, download_name=f"luna_results_{job_id}.zip")
+        # Conditional responses let clients revalidate without re-downloading
+        return _send_large_file(zip_path, f"luna_results_{job_id}.zip",
+                                'application/zip')
 
     @staticmethod
     def get_individual_file(job_id: str, filename: str):
         """Get individual result file"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         if job.status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
@@ -68,71 +158,71 @@ class ResultsController:
             job_id, current_app.config['RESULTS_FOLDER'])
 
         # Search for file in job directory
-        for root, dirs, files in os.walk(job_dir):
-            if filename in files:
-                file_path = os.path.join(root, filename)
-                return send_file(file_path, as_attachment=True, download_name=filename)
+        file_path = _find_file(job, job_dir, filename)
+        if file_path is None:
+            return jsonify({"error": "File not found"}), 404
 
-        return jsonify({"error": "File not found"}), 404
+        return send_file(file_path, as_attachment=True, download_name=filename,
+                         conditional=True, etag=True, max_age=0)
 
     @staticmethod
     def list_result_files(job_id: str):
         """List all available result files"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         if job.status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
         job_dir = get_job_directory(
             job_id, current_app.config['RESULTS_FOLDER'])
 
-        if not os.path.exists(job_dir):
+        try:
+            dir_mtime = os.stat(job_dir).st_mtime_ns
+        except OSError:
             return jsonify({"error": "Results directory not found"}), 404
 
+        # A completed job's directory no longer changes, so reuse the last body
+        cached = job.files_info_cache
+        if cached is not None and cached[0] == dir_mtime:
+            return current_app.response_class(cached[1], mimetype='application/json')
+
         files_info = []
-        for root, dirs, files in os.walk(job_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, job_dir)
-                file_size = os.path.getsize(file_path)
-
-                # Get file type
-                mime_type, _ = mimetypes.guess_type(file_path)
-                file_type = "unknown"
-                if mime_type:
-                    if mime_type.startswith('image/'):
-                        file_type = "image"
-                    elif mime_type.startswith('application/'):
-                        file_type = "data"
-                    elif mime_type.startswith('text/'):
-                        file_type = "text"
-
-                files_info.append({
-                    "filename": file,
-                    "path": relative_path,
-                    "size_bytes": file_size,
-                    "size_mb": round(file_size / (1024 * 1024), 2),
-                    "type": file_type,
-                    "mime_type": mime_type
-                })
+        prefix_len = len(os.path.join(job_dir, ''))
+        for entry in scan_files(job_dir):
+            # Entries live under job_dir, so slicing gives the relative path
+            relative_path = entry.path[prefix_len:]
+            # DirEntry.stat() reuses the data gathered during the scan
+            file_size = entry.stat().st_size
+
+            # Get file type
+            mime_type, file_type = _mime_for_ext(os.path.splitext(entry.name)[1])
+
+            files_info.append({
+                "filename": entry.name,
+                "path": relative_path,
+                "size_bytes": file_size,
+                "size_mb": round(file_size / BYTES_PER_MB, 2),
+                "type": file_type,
+                "mime_type": mime_type
+            })
 
-        return jsonify({
+        response = jsonify({
             "job_id": job_id,
             "total_files": len(files_info),
             "files": files_info
         })
+        job.files_info_cache = (dir_mtime, response.get_data())
+        return response
 
     @staticmethod
     def preview_file(job_id: str, filename: str):
         """Preview file (for images)"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         if job.status != JobStatus.COMPLETED:
             return jsonify({"error": "Job not completed yet"}), 400
 
@@ -140,18 +230,17 @@ class ResultsController:
             job_id, current_app.config['RESULTS_FOLDER'])
 
         # Search for file in job directory
-        for root, dirs, files in os.walk(job_dir):
-            if filename in files:
-                file_path = os.path.join(root, filename)
+        file_path = _find_file(job, job_dir, filename)
+        if file_path is None:
+            return jsonify({"error": "File not found"}), 404
 
-                # Check if it's an image
-                try:
-                    with Image.open(file_path) as img:
-                        return send_file(file_path, mimetype='image/png')
-                except Exception:
-                    return jsonify({"error": "File is not a valid image"}), 400
+        # Check if it's an image
+        mimetype = _image_mimetype(file_path)
+        if mimetype is None:
+            return jsonify({"error": "File is not a valid image"}), 400
 
-        return jsonify({"error": "File not found"}), 404
+        return send_file(file_path, mimetype=mimetype,
+                         conditional=True, etag=True, max_age=0)
 
     @staticmethod
     @jwt_required()
@@ -159,7 +248,7 @@ class ResultsController:
         """Get all processing results for the current user"""
         try:
             current_user_id = get_jwt_identity()
-            print(f"Debug: current_user_id = {current_user_id}")
+            logger.debug("current_user_id = %s", current_user_id)
 
             if not current_user_id:
                 return jsonify({
@@ -167,16 +256,29 @@ class ResultsController:
                     "error": "Authentication required"
                 }), 401
 
-            results = ProcessingResult.find_by_user_id(
-                current_user_id, limit=100)
-
-            print(
-                f"Debug: Found {len(results)} results for user {current_user_id}")
-
-            # Return results array directly for the frontend to work
-            return jsonify(results)
+            # The result cards render the analysis and processing summaries
+            results = ProcessingResult.iter_by_user_id(
+                current_user_id, limit=100,
+                fields=('analysis_results', 'processing_info'))
+            # Fetch the first batch now so database errors still become a 500
+            first = next(results, None)
+            logger.debug("Streaming results for user %s", current_user_id)
+
+            dumps = current_app.json.dumps_bytes
+
+            def generate():
+                # Same JSON array the frontend expects, emitted as each batch arrives
+                yield b"["
+                if first is not None:
+                    yield dumps(first)
+                    for result in results:
+                        yield b"," + dumps(result)
+                yield b"]\n"
+
+            return current_app.response_class(
+                stream_with_context(generate()), mimetype='application/json')
         except Exception as e:
-            print(f"Debug: Error in get_user_results: {e}")
+            logger.exception("Error in get_user_results: %s", e)
             return jsonify({
                 "success": False,
                 "error": "Failed to retrieve results",
@@ -4,21 +4,33 @@ Status controller for job monitoring and tracking
 
 from flask import jsonify
 from datetime import datetime
+from operator import itemgetter
 
 from models.job import JobStatus, job_storage
 
 
+# Processing steps and the overall progress at which each one starts
+_PROCESSING_STEPS = (
+    ("Upload", 0),
+    ("Validation", 10),
+    ("Shape-from-Shading", 30),
+    ("DEM Generation", 50),
+    ("Visualization", 70),
+    ("Analysis", 80),
+    ("Packaging", 95)
+)
+
+
 class StatusController:
     """Handle job status queries and monitoring"""
 
     @staticmethod
     def get_job_status(job_id: str):
         """Get job processing status"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         # Check if job has a future and it's done
         if hasattr(job, 'future') and job.future and job.future.done():
             try:
@@ -33,8 +45,8 @@ class StatusController:
             "status": job.status.value,
             "progress": job.progress,
             "message": job.message,
-            "created_at": job.created_at.isoformat(),
-            "updated_at": job.updated_at.isoformat(),
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
             "error_message": job.error_message,
             "original_filename": job.original_filename
         })
@@ -42,11 +54,10 @@ class StatusController:
     @staticmethod
     def get_detailed_status(job_id: str):
         """Get detailed job status with processing steps"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         # Calculate elapsed time
         elapsed_seconds = (datetime.now() - job.created_at).total_seconds()
 
@@ -56,20 +67,10 @@ class StatusController:
             total_estimated = elapsed_seconds / (job.progress / 100)
             estimated_remaining = max(0, total_estimated - elapsed_seconds)
 
+        progress = job.progress
         processing_steps = [
-            {"step": "Upload", "progress": min(100, max(0, job.progress))},
-            {"step": "Validation", "progress": min(
-                100, max(0, job.progress - 10))},
-            {"step": "Shape-from-Shading",
-                "progress": min(100, max(0, job.progress - 30))},
-            {"step": "DEM Generation", "progress": min(
-                100, max(0, job.progress - 50))},
-            {"step": "Visualization", "progress": min(
-                100, max(0, job.progress - 70))},
-            {"step": "Analysis", "progress": min(
-                100, max(0, job.progress - 80))},
-            {"step": "Packaging", "progress": min(
-                100, max(0, job.progress - 95))}
+            {"step": step, "progress": min(100, max(0, progress - offset))}
+            for step, offset in _PROCESSING_STEPS
         ]
 
         return jsonify({
@@ -77,8 +78,8 @@ class StatusController:
             "status": job.status.value,
             "progress": job.progress,
             "message": job.message,
-            "created_at": job.created_at.isoformat(),
-            "updated_at": job.updated_at.isoformat(),
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
             "elapsed_time_seconds": elapsed_seconds,
             "estimated_remaining_seconds": estimated_remaining,
             "processing_steps": processing_steps,
@@ -89,34 +90,38 @@ class StatusController:
     def get_all_jobs():
         """Get all job statuses (admin endpoint)"""
         jobs_summary = []
+        # Tally statuses in the same pass that builds the summary
+        status_counts = dict.fromkeys(JobStatus, 0)
         for job_id, job in job_storage.items():
+            status = job.status
+            status_counts[status] += 1
             jobs_summary.append({
                 "job_id": job_id,
-                "status": job.status.value,
+                "status": status.value,
                 "progress": job.progress,
-                "created_at": job.created_at.isoformat(),
+                # The app's orjson provider serializes datetimes as ISO 8601
+                "created_at": job.created_at,
                 "original_filename": job.original_filename
             })
 
         # Sort by creation time (newest first)
-        jobs_summary.sort(key=lambda x: x["created_at"], reverse=True)
+        jobs_summary.sort(key=itemgetter("created_at"), reverse=True)
 
         return jsonify({
             "total_jobs": len(jobs_summary),
-            "active_jobs": len([j for j in jobs_summary if j["status"] in ["queued", "processing"]]),
-            "completed_jobs": len([j for j in jobs_summary if j["status"] == "completed"]),
-            "failed_jobs": len([j for j in jobs_summary if j["status"] == "failed"]),
+            "active_jobs": status_counts[JobStatus.QUEUED] + status_counts[JobStatus.PROCESSING],
+            "completed_jobs": status_counts[JobStatus.COMPLETED],
+            "failed_jobs": status_counts[JobStatus.FAILED],
             "jobs": jobs_summary
         })
 
     @staticmethod
     def cancel_job(job_id: str):
         """Cancel a processing job"""
-        if job_id not in job_storage:
+        job = job_storage.get(job_id)
+        if job is None:
             return jsonify({"error": "Job not found"}), 404
 
-        job = job_storage[job_id]
-
         if job.status in [JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED]:
             return jsonify({"error": f"Cannot cancel job in {job.status.value} state"}), 400
 
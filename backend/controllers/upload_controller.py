@@ -3,16 +3,33 @@ Upload controller for Luna photoclinometry operations
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
-from werkzeug.utils import secure_filename
 
 from models.job import ProcessingJob, JobStatus, job_storage
 from services.luna_processor import LunaProcessor
-from utils.helpers import allowed_file, ensure_directory, cleanup_directory, cleanup_user_files
+from utils.helpers import (allowed_file, ensure_directory, remove_stale_entries,
+                           cleanup_user_files, save_upload, fast_secure_filename)
 
 upload_bp = Blueprint('upload', __name__)
 
+# Single background worker for file cleanup so uploads never wait on it
+_cleanup_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def _cleanup_previous_files(user_id, job_id: str, upload_folder: str,
+                            results_folder: str, max_age_seconds: float):
+    """Remove the user's earlier results and any stale uploads/results"""
+    try:
+        # Server-side only, not from Cloudinary
+        if user_id:
+            cleanup_user_files(user_id, keep_job_id=job_id)
+        remove_stale_entries(upload_folder, max_age_seconds)
+        remove_stale_entries(results_folder, max_age_seconds)
+    except Exception as e:
+        print(f"Error during background cleanup: {e}")
+
 
 @upload_bp.route('/upload', methods=['POST'])
 @jwt_required(optional=True)
@@ -41,16 +58,6 @@ def upload_and_process():
                 "error": f"Unsupported file type. Allowed: {', '.join(current_app.config['ALLOWED_EXTENSIONS'])}"
             }), 400
 
-        # Cleanup previous uploads and results (server-side only, not from Cloudinary)
-        if user_id:
-            cleanup_user_files(user_id)
-
-        # Cleanup old uploads directory completely
-        cleanup_directory(current_app.config['UPLOAD_FOLDER'])
-
-        # Cleanup old server_results directory completely
-        cleanup_directory(current_app.config['RESULTS_FOLDER'])
-
         # Ensure directories exist
         ensure_directory(current_app.config['UPLOAD_FOLDER'])
         ensure_directory(current_app.config['RESULTS_FOLDER'])
@@ -59,10 +66,10 @@ def upload_and_process():
         job = ProcessingJob.create_new("", file.filename)
 
         # Save uploaded file
-        filename = secure_filename(file.filename)
+        filename = fast_secure_filename(file.filename)
         file_path = os.path.join(
             current_app.config['UPLOAD_FOLDER'], f"{job.job_id}_{filename}")
-        file.save(file_path)
+        file_size = save_upload(file, file_path)
         job.image_path = file_path
 
         # Store job
@@ -78,12 +85,20 @@ def upload_and_process():
         # Submit for processing with user ID
         LunaProcessor.submit_processing_job(job, user_id)
 
+        # Clean up previous uploads and results in the background; only
+        # entries older than the job timeout are swept, so live jobs survive
+        _cleanup_executor.submit(
+            _cleanup_previous_files, user_id, job.job_id,
+            current_app.config['UPLOAD_FOLDER'],
+            current_app.config['RESULTS_FOLDER'],
+            current_app.config.get('JOB_TIMEOUT', 3600))
+
         return jsonify({
             "job_id": job.job_id,
             "status": job.status.value,
             "message": "Image uploaded successfully. Processing started.",
             "filename": job.original_filename,
-            "file_size": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
+            "file_size": file_size,
             "user_authenticated": user_id is not None
         }), 200
 
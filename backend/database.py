@@ -4,8 +4,10 @@ MongoDB database configuration and connection
 
 import os
 import ssl
+import threading
 import certifi
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.write_concern import WriteConcern
 from flask_pymongo import PyMongo
 from dotenv import load_dotenv
 
@@ -13,71 +15,149 @@ load_dotenv()
 
 mongo = PyMongo()
 
-
-def init_db(app):
-    """Initialize MongoDB connection"""
+# One pooled client per process; MongoClient is thread-safe
+_client = None
+_client_lock = threading.Lock()
+# Database and collection handles, bound to the current client
+_db = None
+_collections = {}
+# (collection, keys) of every index ensure_indexes() has confirmed
+_confirmed_indexes = set()
+
+POOL_OPTIONS = {
+    "maxPoolSize": int(os.getenv('MONGODB_MAX_POOL_SIZE', '200')),
+    "minPoolSize": int(os.getenv('MONGODB_MIN_POOL_SIZE', '10')),
+    "maxIdleTimeMS": 300000,
+    "retryWrites": True
+}
+
+
+def _get_mongodb_uri() -> str:
+    """Return the configured MongoDB URI"""
     mongodb_uri = os.getenv('MONGODB_URI')
-    mongodb_database = os.getenv('MONGODB_DATABASE', 'luna_photoclinometry')
-
     if not mongodb_uri:
         raise ValueError("MONGODB_URI environment variable is required")
+    return mongodb_uri
+
+
+def _create_client(mongodb_uri: str) -> MongoClient:
+    """Create a pooled client, verifying certificates for MongoDB Atlas"""
+    if 'mongodb.net' in mongodb_uri:
+        print("🔐 Connecting to MongoDB Atlas with SSL...")
+        return MongoClient(mongodb_uri,
+                           tlsCAFile=certifi.where(),
+                           tlsAllowInvalidCertificates=False,
+                           **POOL_OPTIONS)
+    return MongoClient(mongodb_uri, **POOL_OPTIONS)
+
+
+def get_client() -> MongoClient:
+    """Get the shared MongoDB client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client(_get_mongodb_uri())
+    return _client
+
+
+def init_db(app):
+    """Initialize MongoDB connection"""
+    global _client, _db
+    mongodb_uri = _get_mongodb_uri()
 
     # Use the URI as-is, without modification for flask-pymongo
     # The database will be accessed via the get_db() function
     app.config["MONGO_URI"] = mongodb_uri
 
+    # Test the connection once at startup rather than on every request
     try:
-        # Skip flask-pymongo initialization and use direct connection instead
-        print("✅ MongoDB connection configuration set successfully")
-        return True
+        get_client().admin.command('ping')
+        print("✅ MongoDB connection successful!")
+        ensure_indexes()
     except Exception as e:
-        print(f"❌ MongoDB initialization failed: {e}")
-        raise
+        print(f"❌ Primary connection failed: {e}")
+        if 'mongodb.net' not in mongodb_uri:
+            return True
+        # Fallback to SSL bypass for development
+        try:
+            print("⚠️  Warning: Using SSL bypass for MongoDB connection (development only)")
+            client = MongoClient(mongodb_uri,
+                                 tlsAllowInvalidCertificates=True,
+                                 ssl_cert_reqs=ssl.CERT_NONE,
+                                 **POOL_OPTIONS)
+            client.admin.command('ping')
+            with _client_lock:
+                _client, primary = client, _client
+                _db = None
+                _collections.clear()
+            primary.close()
+            print("✅ MongoDB fallback connection successful!")
+            ensure_indexes()
+        except Exception as fallback_error:
+            print(f"❌ All connection attempts failed: {fallback_error}")
 
     return True
 
 
-def get_db():
-    """Get database instance"""
-    mongodb_uri = os.getenv('MONGODB_URI')
-    mongodb_database = os.getenv('MONGODB_DATABASE', 'luna_photoclinometry')
+# (collection, keys, options) for every index the query paths rely on
+INDEXES = (
+    # User result listings and statistics: equality on user_id, newest first
+    ('processing_results', [('user_id', ASCENDING), ('created_at', DESCENDING)], {}),
+    # One result record per job; serves find_by_job_id
+    ('processing_results', [('job_id', ASCENDING)], {'unique': True}),
+    # Login and registration lookups
+    ('users', [('email', ASCENDING)], {'unique': True}),
+    ('users', [('username', ASCENDING)], {'unique': True}),
+)
 
-    if not mongodb_uri:
-        raise ValueError("MONGODB_URI environment variable is required")
 
-    try:
-        # Configure SSL for MongoDB Atlas with proper certificate handling
-        if 'mongodb.net' in mongodb_uri:
-            print("🔐 Connecting to MongoDB Atlas with SSL...")
-            client = MongoClient(mongodb_uri,
-                                 tlsCAFile=certifi.where(),
-                                 tlsAllowInvalidCertificates=False)
-        else:
-            client = MongoClient(mongodb_uri)
+def ensure_indexes():
+    """Create the indexes the query paths rely on; a no-op if they exist"""
+    db = get_db()
+    for collection, keys, options in INDEXES:
+        # One failure (e.g. duplicates blocking a unique index) must not skip the rest
+        try:
+            db[collection].create_index(keys, **options)
+            _confirmed_indexes.add((collection, tuple(keys)))
+        except Exception as e:
+            print(f"⚠️  Warning: Could not create index {keys} on {collection}: {e}")
 
-        # Test the connection
-        client.admin.command('ping')
-        print("✅ MongoDB connection successful!")
 
-        return client[mongodb_database]
+def has_unique_indexes(collection: str) -> bool:
+    """Whether every unique index INDEXES declares for collection is confirmed"""
+    # False until ensure_indexes() has run and built them, e.g. when it
+    # never ran or existing duplicates blocked a unique index
+    return all((name, tuple(keys)) in _confirmed_indexes
+               for name, keys, options in INDEXES
+               if name == collection and options.get('unique'))
 
-    except Exception as e:
-        print(f"❌ Primary connection failed: {e}")
-        # Fallback to SSL bypass for development
-        try:
-            if 'mongodb.net' in mongodb_uri:
-                print(
-                    "⚠️  Warning: Using SSL bypass for MongoDB connection (development only)")
-                client = MongoClient(mongodb_uri,
-                                     tlsAllowInvalidCertificates=True,
-                                     ssl_cert_reqs=ssl.CERT_NONE)
-                # Test the connection
-                client.admin.command('ping')
-                print("✅ MongoDB fallback connection successful!")
-                return client[mongodb_database]
-            else:
-                client = MongoClient(mongodb_uri)
-                return client[mongodb_database]
-        except Exception as fallback_error:
-            print(f"❌ All connection attempts failed: {fallback_error}")
-            raise fallback_error
+
+def supports_transactions() -> bool:
+    """Whether the connected deployment can run multi-document transactions"""
+    # Replica sets (including Atlas) and sharded clusters can; a standalone
+    # mongod, or a topology not yet discovered, is treated as unable
+    return get_client().topology_description.topology_type_name in (
+        'ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced')
+
+
+def get_db():
+    """Get database instance, resolved once per client"""
+    global _db
+    if _db is None:
+        _db = get_client()[os.getenv('MONGODB_DATABASE', 'luna_photoclinometry')]
+    return _db
+
+
+def get_collection(name: str, acknowledged: bool = True):
+    """Get a collection handle, created once and reused across requests"""
+    # Unacknowledged (w=0) handles don't wait for the server; only for writes
+    # whose rare loss is harmless, like progress telemetry
+    key = (name, acknowledged)
+    collection = _collections.get(key)
+    if collection is None:
+        collection = get_db()[name]
+        if not acknowledged:
+            collection = collection.with_options(write_concern=WriteConcern(w=0))
+        _collections[key] = collection
+    return collection
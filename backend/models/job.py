@@ -2,10 +2,12 @@
 Job models and data structures for Luna processing
 """
 
+import os
 import uuid
-from datetime import datetime
-from typing import Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+from dataclasses import dataclass
 from enum import Enum
 
 
@@ -18,7 +20,7 @@ class JobStatus(Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessingJob:
     """Processing job data model"""
     job_id: str
@@ -31,12 +33,22 @@ class ProcessingJob:
     original_filename: str
     error_message: Optional[str] = None
     results: Optional[Dict[str, Any]] = None
+    # Result file name -> path, built once the job completes
+    file_index: Optional[Dict[str, str]] = None
+    # (results dir mtime_ns, encoded list_result_files body) for repeat polls
+    files_info_cache: Optional[Tuple[int, bytes]] = None
+    # Encoded results body, reused while the job stays COMPLETED
+    results_cache: Optional[bytes] = None
+    # MongoDB processing result linked to this job, for authenticated uploads
+    result_id: Optional[str] = None
 
     @classmethod
     def create_new(cls, image_path: str, original_filename: str) -> 'ProcessingJob':
         """Create a new processing job"""
         now = datetime.now()
         return cls(
+            # Random, not sequential: anyone holding a job ID can fetch its
+            # results, so IDs must not be guessable or enumerable
             job_id=str(uuid.uuid4()),
             status=JobStatus.QUEUED,
             progress=0.0,
@@ -49,6 +61,9 @@ class ProcessingJob:
 
     def update_status(self, status: JobStatus, progress: float = None, message: str = None):
         """Update job status"""
+        if status != self.status:
+            self.files_info_cache = None
+            self.results_cache = None
         self.status = status
         if progress is not None:
             self.progress = progress
@@ -59,18 +74,75 @@ class ProcessingJob:
     def set_error(self, error_message: str):
         """Set job as failed with error message"""
         self.status = JobStatus.FAILED
+        self.files_info_cache = None
+        self.results_cache = None
         self.error_message = error_message
         self.message = f"Processing failed: {error_message}"
         self.updated_at = datetime.now()
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
-        data = asdict(self)
-        data['status'] = self.status.value
-        data['created_at'] = self.created_at.isoformat()
-        data['updated_at'] = self.updated_at.isoformat()
-        return data
+        # Built by hand: asdict() would deep-copy the results tree
+        return {
+            'job_id': self.job_id,
+            'status': self.status.value,
+            'progress': self.progress,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'image_path': self.image_path,
+            'original_filename': self.original_filename,
+            'error_message': self.error_message,
+            'results': self.results,
+            'result_id': self.result_id
+        }
+
+
+class JobSnapshot(NamedTuple):
+    """Read-only view of a job's status and results taken in one step"""
+    status: JobStatus
+    results: Optional[Dict[str, Any]]
+
+
+# Finished jobs beyond this count, or older than the TTL, are evicted
+MAX_STORED_JOBS = int(os.getenv('MAX_STORED_JOBS', '1000'))
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '86400'))
+
+TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class JobStorage(OrderedDict):
+    """In-memory job registry keyed by job ID, kept in insertion order"""
+
+    def __setitem__(self, job_id: str, job: ProcessingJob):
+        super().__setitem__(job_id, job)
+        self.evict_finished()
+
+    def evict_finished(self, max_jobs: int = None, max_age_seconds: float = None):
+        """Drop finished jobs past their TTL, then the oldest until at most max_jobs remain"""
+        if max_jobs is None:
+            max_jobs = MAX_STORED_JOBS
+        if max_age_seconds is None:
+            max_age_seconds = JOB_TTL_SECONDS
+        excess = len(self) - max_jobs
+        cutoff = datetime.now() - timedelta(seconds=max_age_seconds)
+        # Queued and running jobs are never evicted
+        finished = [(job_id, job) for job_id, job in list(self.items())
+                    if job.status in TERMINAL_STATUSES]
+        for index, (job_id, job) in enumerate(finished):
+            if index < excess or job.updated_at < cutoff:
+                self.pop(job_id, None)
+
+    def snapshot(self, job_id: str) -> Optional[JobSnapshot]:
+        """Read a job's status and results once, or None if the job is unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        # Read status before results: the processor publishes results before
+        # marking a job COMPLETED, so a COMPLETED snapshot always carries them
+        status = job.status
+        return JobSnapshot(status, job.results)
 
 
 # Global job storage (use Redis/DB in production)
-job_storage: Dict[str, ProcessingJob] = {}
+job_storage = JobStorage()
@@ -2,11 +2,39 @@
 Processing Result model for MongoDB
 """
 
-from database import get_db
+import cache
+from database import get_collection
 from services.cloudinary_service import CloudinaryService
 from bson import ObjectId
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+
+# Bulky fields left out of result listings unless a caller opts back in
+HEAVY_FIELDS = ('analysis_report_json', 'processing_info', 'analysis_results')
+
+
+# Plain progress ticks are written only after this much change or time
+PROGRESS_FLUSH_DELTA = 5.0
+PROGRESS_FLUSH_INTERVAL = 2.0
+
+# result_id -> (progress, monotonic time) of the last progress write
+_last_progress_flush: Dict[str, tuple] = {}
+
+
+# Timestamp fields stored as BSON dates and returned as ISO 8601 strings
+DATETIME_FIELDS = ('created_at', 'updated_at', 'completed_at')
+
+
+def _serialize_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a stored result JSON-ready in place: string _id, ISO timestamps"""
+    doc['_id'] = str(doc['_id'])
+    for field in DATETIME_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, datetime):
+            doc[field] = value.isoformat()
+    return doc
 
 
 class ProcessingResult:
@@ -46,7 +74,9 @@ class ProcessingResult:
     def create_result(user_id: str, job_id: str, filename: str) -> Optional[str]:
         """Create a new processing result record"""
         try:
-            db = get_db()
+            collection = get_collection('processing_results')
+            # Native datetimes store as 8-byte BSON dates and sort/range-query as dates
+            now = datetime.utcnow()
             result = {
                 'user_id': user_id,
                 'job_id': job_id,
@@ -54,8 +84,8 @@ class ProcessingResult:
                 'original_filename': filename,
                 'status': 'queued',
                 'progress': 0,
-                'created_at': datetime.utcnow().isoformat(),
-                'updated_at': datetime.utcnow().isoformat(),
+                'created_at': now,
+                'updated_at': now,
                 'cloudinary_urls': {
                     "original_image": None,
                     "dem_geotiff": None,
@@ -76,7 +106,8 @@ class ProcessingResult:
                 'error_message': None
             }
 
-            insert_result = db.processing_results.insert_one(result)
+            insert_result = collection.insert_one(result)
+            cache.invalidate_user_stats(user_id)
             return str(insert_result.inserted_id)
         except Exception as e:
             print(f"Error creating processing result: {e}")
@@ -86,12 +117,13 @@ class ProcessingResult:
     def update_result(result_id: str, updates: Dict[str, Any]) -> bool:
         """Update processing result"""
         try:
-            db = get_db()
-            updates['updated_at'] = datetime.utcnow().isoformat()
-            db.processing_results.update_one(
+            collection = get_collection('processing_results')
+            updates['updated_at'] = datetime.utcnow()
+            collection.update_one(
                 {'_id': ObjectId(result_id)},
                 {'$set': updates}
             )
+            cache.invalidate_result(result_id)
             return True
         except Exception as e:
             print(f"Error updating processing result: {e}")
@@ -101,23 +133,16 @@ class ProcessingResult:
     def find_by_id(result_id: str) -> Optional[Dict[str, Any]]:
         """Find processing result by ID"""
         try:
-            db = get_db()
-            if isinstance(result_id, str):
-                object_id = ObjectId(result_id)
-                result = db.processing_results.find_one({'_id': object_id})
+            cached = cache.get_result(str(result_id))
+            if cached is not None:
+                return cached
+
+            collection = get_collection('processing_results')
+            object_id = result_id if isinstance(result_id, ObjectId) else ObjectId(result_id)
+            result = collection.find_one({'_id': object_id})
             if result:
-                result['_id'] = str(result['_id'])
-
-                # Convert datetime objects to ISO format strings for JSON serialization
-                if 'created_at' in result:
-                    if isinstance(result['created_at'], datetime):
-                        result['created_at'] = result['created_at'].isoformat()
-                if 'updated_at' in result:
-                    if isinstance(result['updated_at'], datetime):
-                        result['updated_at'] = result['updated_at'].isoformat()
-                if 'completed_at' in result:
-                    if isinstance(result['completed_at'], datetime):
-                        result['completed_at'] = result['completed_at'].isoformat()
+                _serialize_document(result)
+                cache.set_result(result)
 
             return result
         except Exception as e:
@@ -128,21 +153,15 @@ class ProcessingResult:
     def find_by_job_id(job_id: str) -> Optional[Dict[str, Any]]:
         """Find processing result by job ID"""
         try:
-            db = get_db()
-            result = db.processing_results.find_one({'job_id': job_id})
+            cached = cache.get_result_by_job(job_id)
+            if cached is not None:
+                return cached
+
+            collection = get_collection('processing_results')
+            result = collection.find_one({'job_id': job_id})
             if result:
-                result['_id'] = str(result['_id'])
-
-                # Convert datetime objects to ISO format strings for JSON serialization
-                if 'created_at' in result:
-                    if isinstance(result['created_at'], datetime):
-                        result['created_at'] = result['created_at'].isoformat()
-                if 'updated_at' in result:
-                    if isinstance(result['updated_at'], datetime):
-                        result['updated_at'] = result['updated_at'].isoformat()
-                if 'completed_at' in result:
-                    if isinstance(result['completed_at'], datetime):
-                        result['completed_at'] = result['completed_at'].isoformat()
+                _serialize_document(result)
+                cache.set_result(result)
 
             return result
         except Exception as e:
@@ -150,29 +169,24 @@ class ProcessingResult:
             return None
 
     @staticmethod
-    def find_by_user_id(user_id: str, limit: int = 10) -> list:
-        """Find processing results by user ID"""
-        try:
-            db = get_db()
-            results = list(db.processing_results.find(
-                {'user_id': user_id}
-            ).sort('created_at', -1).limit(limit))
+    def iter_by_user_id(user_id: str, limit: int = 10, fields: Iterable[str] = (),
+                        batch_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """Yield processing results by user ID, newest first, fetched in network batches"""
+        collection = get_collection('processing_results')
+        projection = {field: 0 for field in HEAVY_FIELDS if field not in fields} or None
+        # Served by the (user_id, created_at) index from ensure_indexes()
+        cursor = collection.find(
+            {'user_id': user_id}, projection
+        ).sort('created_at', -1).limit(limit).batch_size(batch_size)
+
+        for result in cursor:
+            yield _serialize_document(result)
 
-            for result in results:
-                result['_id'] = str(result['_id'])
-
-                # Convert datetime objects to ISO format strings for JSON serialization
-                if 'created_at' in result:
-                    if isinstance(result['created_at'], datetime):
-                        result['created_at'] = result['created_at'].isoformat()
-                if 'updated_at' in result:
-                    if isinstance(result['updated_at'], datetime):
-                        result['updated_at'] = result['updated_at'].isoformat()
-                if 'completed_at' in result:
-                    if isinstance(result['completed_at'], datetime):
-                        result['completed_at'] = result['completed_at'].isoformat()
-
-            return results
+    @staticmethod
+    def find_by_user_id(user_id: str, limit: int = 10, fields: Iterable[str] = ()) -> list:
+        """Find processing results by user ID, newest first; fields opts back into HEAVY_FIELDS"""
+        try:
+            return list(ProcessingResult.iter_by_user_id(user_id, limit, fields))
         except Exception as e:
             print(f"Error finding user processing results: {e}")
             return []
@@ -181,10 +195,10 @@ class ProcessingResult:
     def delete_result(result_id: str) -> bool:
         """Delete processing result and associated cloud files"""
         try:
-            db = get_db()
+            collection = get_collection('processing_results')
 
             # Get the result first to access cloudinary URLs
-            result = db.processing_results.find_one(
+            result = collection.find_one(
                 {'_id': ObjectId(result_id)})
             if result:
                 # Delete from Cloudinary
@@ -196,12 +210,14 @@ class ProcessingResult:
                         job_id = result.get('job_id')
                         if job_id:
                             cloudinary_service.delete_folder(
-                                f"luna_results/luna_job_{job_id}")
+                                f"luna_job_{job_id}")
                 except Exception as e:
                     print(f"Error deleting Cloudinary files: {e}")
 
                 # Delete from database
-                db.processing_results.delete_one({'_id': ObjectId(result_id)})
+                collection.delete_one({'_id': ObjectId(result_id)})
+                cache.invalidate_result(result_id, result.get('job_id'))
+                cache.invalidate_user_stats(result.get('user_id'))
                 return True
             return False
         except Exception as e:
@@ -209,38 +225,52 @@ class ProcessingResult:
             return False
 
     @staticmethod
-    def delete_all_by_user(user_id: str) -> bool:
-        """Delete all results for a user"""
+    def delete_documents_by_user(user_id: str, session=None) -> list:
+        """Delete a user's result records, raising on failure so a transaction can abort"""
+        # Only what cleanup_deleted_results() needs once the deletes commit
+        collection = get_collection('processing_results')
+        results = list(collection.find(
+            {"user_id": user_id}, {'job_id': 1, 'cloudinary_urls': 1}, session=session))
+        collection.delete_many({"user_id": user_id}, session=session)
+        return results
+
+    @staticmethod
+    def cleanup_deleted_results(user_id: str, results: list):
+        """Remove cloud files and cache entries for records already deleted"""
+        # Irreversible, so only run once the database delete has committed
         try:
-            db = get_db()
-            results = ProcessingResult.find_by_user_id(
-                user_id, limit=1000)  # Get all results
-
-            # Delete from Cloudinary
-            try:
-                cloudinary_service = CloudinaryService()
-                for result in results:
-                    cloudinary_urls = result.get('cloudinary_urls', {})
-                    if cloudinary_urls:
-                        job_id = result.get('job_id')
-                        if job_id:
-                            cloudinary_service.delete_folder(
-                                f"luna_results/luna_job_{job_id}")
-            except Exception as e:
-                print(f"Error deleting Cloudinary files: {e}")
+            job_folders = [f"luna_job_{result['job_id']}" for result in results
+                           if result.get('cloudinary_urls') and result.get('job_id')]
+            if job_folders:
+                CloudinaryService().delete_folders(job_folders)
+        except Exception as e:
+            print(f"Error deleting Cloudinary files: {e}")
 
-            # Delete from database
-            db.processing_results.delete_many({"user_id": user_id})
-            return True
+        cache.invalidate_user_stats(user_id)
+        for result in results:
+            cache.invalidate_result(result['_id'], result.get('job_id'))
+
+    @staticmethod
+    def delete_all_by_user(user_id: str) -> bool:
+        """Delete all results for a user and their cloud files"""
+        try:
+            results = ProcessingResult.delete_documents_by_user(user_id)
         except Exception as e:
             print(f"Error deleting user results: {e}")
             return False
+        ProcessingResult.cleanup_deleted_results(user_id, results)
+        return True
 
     @staticmethod
     def get_user_statistics(user_id: str) -> Dict[str, int]:
         """Get user processing statistics"""
         try:
-            db = get_db()
+            # Served from cache until one of the user's results changes status
+            cached = cache.get_user_stats(user_id)
+            if cached is not None:
+                return cached
+
+            collection = get_collection('processing_results')
             pipeline = [
                 {'$match': {'user_id': user_id}},
                 {'$group': {
@@ -249,7 +279,7 @@ class ProcessingResult:
                 }}
             ]
 
-            results = list(db.processing_results.aggregate(pipeline))
+            results = list(collection.aggregate(pipeline))
             stats = {
                 'total_results': 0,
                 'completed_results': 0,
@@ -272,6 +302,7 @@ class ProcessingResult:
                 elif status == 'failed':
                     stats['failed_results'] = count
 
+            cache.set_user_stats(user_id, stats)
             return stats
         except Exception as e:
             print(f"Error getting user statistics: {e}")
@@ -283,46 +314,19 @@ class ProcessingResult:
                 'failed_results': 0
             }
 
-    def update_status(self, status, processing_info=None, analysis_results=None):
-        """Update processing status and results"""
-        try:
-            db = get_db()
-            update_data = {
-                "status": status,
-                "updated_at": datetime.utcnow().isoformat()
-            }
-
-            if processing_info:
-                update_data["processing_info"] = processing_info
-                self.processing_info = processing_info
-
-            if analysis_results:
-                update_data["analysis_results"] = analysis_results
-                self.analysis_results = analysis_results
-
-            self.status = status
-
-            db.processing_results.update_one(
-                {"_id": self._id},
-                {"$set": update_data}
-            )
-            return True
-        except Exception as e:
-            print(f"Error updating status: {e}")
-            return False
-
     def update_cloudinary_urls(self, cloudinary_urls):
         """Update Cloudinary URLs"""
         try:
-            db = get_db()
+            collection = get_collection('processing_results')
             self.cloudinary_urls = cloudinary_urls
-            db.processing_results.update_one(
+            collection.update_one(
                 {"_id": self._id},
                 {"$set": {
                     "cloudinary_urls": cloudinary_urls,
-                    "updated_at": datetime.utcnow().isoformat()
+                    "updated_at": datetime.utcnow()
                 }}
             )
+            cache.invalidate_result(self._id, self.job_id)
             return True
         except Exception as e:
             print(f"Error updating cloudinary URLs: {e}")
@@ -331,15 +335,16 @@ class ProcessingResult:
     def update_analysis_report_json(self, analysis_report_json):
         """Update analysis report JSON data"""
         try:
-            db = get_db()
+            collection = get_collection('processing_results')
             self.analysis_report_json = analysis_report_json
-            db.processing_results.update_one(
+            collection.update_one(
                 {"_id": self._id},
                 {"$set": {
                     "analysis_report_json": analysis_report_json,
-                    "updated_at": datetime.utcnow().isoformat()
+                    "updated_at": datetime.utcnow()
                 }}
             )
+            cache.invalidate_result(self._id, self.job_id)
             return True
         except Exception as e:
             print(f"Error updating analysis report: {e}")
@@ -347,13 +352,15 @@ class ProcessingResult:
 
     @staticmethod
     def update_status(result_id: str, status: str, processing_info: dict = None,
-                      analysis_results: dict = None, cloudinary_urls: dict = None) -> bool:
-        """Update processing result status and data"""
+                      analysis_results: dict = None, cloudinary_urls: dict = None,
+                      message: str = None) -> bool:
+        """Update processing result status and data, with the final progress message"""
         try:
-            db = get_db()
+            collection = get_collection('processing_results')
+            now = datetime.utcnow()
             update_data = {
                 'status': status,
-                'updated_at': datetime.utcnow().isoformat(),
+                'updated_at': now,
             }
 
             if processing_info:
@@ -365,18 +372,71 @@ class ProcessingResult:
             if cloudinary_urls:
                 update_data['cloudinary_urls'] = cloudinary_urls
 
+            if message:
+                update_data['message'] = message
+
             if status == 'completed':
-                update_data['completed_at'] = datetime.utcnow().isoformat()
+                update_data['completed_at'] = now
+                update_data['progress'] = 100
+            # Final statuses always flush; forget the job's progress throttle
+            _last_progress_flush.pop(result_id, None)
 
-            db.processing_results.update_one(
+            # Returns the owner in the same round-trip for stats invalidation
+            previous = collection.find_one_and_update(
                 {'_id': ObjectId(result_id)},
-                {'$set': update_data}
+                {'$set': update_data},
+                projection={'_id': 0, 'user_id': 1}
             )
+            cache.invalidate_result(result_id)
+            if previous:
+                cache.invalidate_user_stats(previous.get('user_id'))
             return True
         except Exception as e:
             print(f"Error updating processing result: {e}")
             return False
 
+    @staticmethod
+    def set_progress(result_id: str, progress: float, message: str, status: str = None) -> bool:
+        """Atomically set only the progress fields, leaving nested results untouched"""
+        try:
+            now = time.monotonic()
+            if not status:
+                # Throttle plain ticks; status changes always go through
+                last = _last_progress_flush.get(result_id)
+                if last is not None and abs(progress - last[0]) < PROGRESS_FLUSH_DELTA \
+                        and now - last[1] < PROGRESS_FLUSH_INTERVAL:
+                    return True
+            _last_progress_flush[result_id] = (progress, now)
+
+            collection = get_collection('processing_results')
+            update_data = {
+                'progress': progress,
+                'message': message,
+                'updated_at': datetime.utcnow()
+            }
+            if status:
+                update_data['status'] = status
+                previous = collection.find_one_and_update(
+                    {'_id': ObjectId(result_id)},
+                    {'$set': update_data},
+                    projection={'_id': 0, 'user_id': 1}
+                )
+                if previous:
+                    cache.invalidate_user_stats(previous.get('user_id'))
+            else:
+                # Plain progress ticks are fire-and-forget; status changes above stay
+                # acknowledged. An unacknowledged tick can land after the final status
+                # write, so it must not touch a finished job's progress or message
+                get_collection('processing_results', acknowledged=False).update_one(
+                    {'_id': ObjectId(result_id), 'status': {'$nin': ['completed', 'failed']}},
+                    {'$set': update_data}
+                )
+            cache.invalidate_result(result_id)
+            return True
+        except Exception as e:
+            print(f"Error updating processing progress: {e}")
+            return False
+
     def to_dict(self):
         """Convert result to dictionary"""
         return {
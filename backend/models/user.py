@@ -2,18 +2,55 @@
 User model for MongoDB
 """
 
+import os
 from datetime import datetime
+from functools import cached_property, lru_cache
+import bcrypt
 from bson import ObjectId
-from werkzeug.security import generate_password_hash, check_password_hash
+from pymongo.errors import DuplicateKeyError
+from werkzeug.security import check_password_hash
 try:
-    from database import get_db
+    from database import get_client, get_collection, has_unique_indexes, supports_transactions
 except ImportError:
     # Fallback import
     import sys
     import os
     sys.path.append(os.path.dirname(
         os.path.dirname(os.path.abspath(__file__))))
-    from database import get_db
+    from database import get_client, get_collection, has_unique_indexes, supports_transactions
+import cache
+from models.processing_result import ProcessingResult
+
+_utcnow = datetime.utcnow
+
+# Stored fields a User is built from; _id is always returned
+USER_PROJECTION = {"email": 1, "username": 1, "password_hash": 1}
+
+# bcrypt cost for new passwords; each step doubles the hashing time
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+# bcrypt only reads the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with bcrypt"""
+    password_bytes = password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('ascii')
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check a password against a bcrypt hash, or a legacy werkzeug one"""
+    if password_hash.startswith('$2'):
+        password_bytes = password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+        return bcrypt.checkpw(password_bytes, password_hash.encode('ascii'))
+    # Accounts created before the switch to bcrypt
+    return check_password_hash(password_hash, password)
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash() -> str:
+    """Throwaway hash checked for unknown emails, created on first use"""
+    return hash_password(os.urandom(16).hex())
 
 
 class User:
@@ -24,35 +61,47 @@ class User:
         self.email = email
         self.username = username
         self.password_hash = password_hash
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
+        self.created_at = self.updated_at = _utcnow()
+
+    @cached_property
+    def id_str(self) -> str:
+        """The user's ObjectId as a string, converted once per instance"""
+        return str(self._id)
 
     @staticmethod
     def create_user(email, username, password):
         """Create a new user"""
         try:
-            db = get_db()
+            collection = get_collection('users')
 
-            # Check if user already exists
-            existing_user = db.users.find_one(
-                {"$or": [{"email": email}, {"username": username}]})
-            if existing_user:
+            # Without confirmed unique indexes the insert would accept
+            # duplicates, so fall back to looking for an existing user
+            if not has_unique_indexes('users') and collection.find_one(
+                    {"$or": [{"email": email}, {"username": username}]}, {"_id": 1}):
                 print(
                     f"User already exists: email={email}, username={username}")
                 return None
 
-            password_hash = generate_password_hash(password)
+            password_hash = hash_password(password)
+            now = _utcnow()
             user_data = {
                 "email": email,
                 "username": username,
                 "password_hash": password_hash,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
+                "created_at": now,
+                "updated_at": now
             }
 
-            result = db.users.insert_one(user_data)
+            # The unique email and username indexes reject existing users
+            # in the insert itself, without a separate lookup first
+            try:
+                result = collection.insert_one(user_data)
+            except DuplicateKeyError:
+                print(
+                    f"User already exists: email={email}, username={username}")
+                return None
             print(f"User created successfully: {result.inserted_id}")
-            return User.find_by_id(result.inserted_id)
+            return User(email, username, password_hash, result.inserted_id)
         except Exception as e:
             print(f"Error creating user: {e}")
             return None
@@ -61,8 +110,8 @@ class User:
     def find_by_email(email):
         """Find user by email"""
         try:
-            db = get_db()
-            user_data = db.users.find_one({"email": email})
+            collection = get_collection('users')
+            user_data = collection.find_one({"email": email}, USER_PROJECTION)
             if user_data:
                 return User(
                     email=user_data["email"],
@@ -79,18 +128,22 @@ class User:
     def find_by_id(user_id):
         """Find user by ID"""
         try:
-            db = get_db()
-            if isinstance(user_id, str):
-                user_id = ObjectId(user_id)
+            # Every authenticated request resolves its user, so keep them briefly;
+            # JWT identities arrive as strings, so key the cache on those as-is
+            key = user_id if isinstance(user_id, str) else str(user_id)
+            cached = cache.get_user(key)
+            if cached is not None:
+                return User(*cached)
+
+            collection = get_collection('users')
+            object_id = user_id if isinstance(user_id, ObjectId) else ObjectId(user_id)
 
-            user_data = db.users.find_one({"_id": user_id})
+            user_data = collection.find_one({"_id": object_id}, USER_PROJECTION)
             if user_data:
-                return User(
-                    email=user_data["email"],
-                    username=user_data["username"],
-                    password_hash=user_data["password_hash"],
-                    _id=user_data["_id"]
-                )
+                user_fields = (user_data["email"], user_data["username"],
+                               user_data["password_hash"], user_data["_id"])
+                cache.set_user(key, user_fields)
+                return User(*user_fields)
             return None
         except Exception as e:
             print(f"Error finding user by ID: {e}")
@@ -101,7 +154,12 @@ class User:
         """Authenticate user with email and password"""
         try:
             user = User.find_by_email(email)
-            if user and user.password_hash and check_password_hash(user.password_hash, password):
+            if user is None or not user.password_hash:
+                # Still run one hash check so unknown emails take as long to
+                # reject as wrong passwords and can't be told apart by timing
+                verify_password(_dummy_hash(), password)
+                return None
+            if verify_password(user.password_hash, password):
                 return user
             return None
         except Exception as e:
@@ -110,20 +168,34 @@ class User:
 
     def delete_user(self):
         """Delete user and all associated data"""
-        db = get_db()
-
-        # Delete all processing results for this user
-        from models.processing_result import ProcessingResult
-        ProcessingResult.delete_all_by_user(str(self._id))
-
-        # Delete user
-        db.users.delete_one({"_id": self._id})
+        collection = get_collection('users')
+        user_id = self.id_str
+
+        # Delete all processing results for this user and the user together,
+        # so a failure can't leave results behind without an owner
+        if supports_transactions():
+            with get_client().start_session() as session:
+                # Any exception aborts the transaction and propagates
+                with session.start_transaction():
+                    results = ProcessingResult.delete_documents_by_user(
+                        user_id, session=session)
+                    collection.delete_one({"_id": self._id}, session=session)
+            # Cloud files and caches only go once the deletes have committed
+            ProcessingResult.cleanup_deleted_results(user_id, results)
+        else:
+            # Standalone servers have no transactions; keep the user if
+            # their results could not be removed
+            if not ProcessingResult.delete_all_by_user(user_id):
+                return False
+            collection.delete_one({"_id": self._id})
+
+        cache.invalidate_user(user_id)
         return True
 
     def to_dict(self):
         """Convert user to dictionary"""
         return {
-            "_id": str(self._id),
+            "_id": self.id_str,
             "email": self.email,
             "username": self.username,
             "created_at": self.created_at.isoformat(),
@@ -22,24 +22,33 @@ Author: Luna Photoclinometry Team for ISRO Lunar Mission Support
 Version: 3.0 - ISRO Mission Ready Edition
 """
 
+import itertools
 import warnings
-from typing import Any, Tuple, List, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Tuple, List, Optional, Dict
+import matplotlib
+# Set non-interactive backend before pyplot loads, so no GUI backend is probed
+matplotlib.use('Agg')
 from mpl_toolkits.mplot3d import Axes3D
 from tqdm import tqdm
 from scipy.ndimage import laplace, gaussian_filter
 from scipy.optimize import minimize
 import imageio.v2 as imageio
+import cv2
 from rasterio.control import GroundControlPoint
 import rasterio.transform
 import rasterio
 import matplotlib.pyplot as plt
 import os
-import glob
 import shutil
 import numpy as np
-import matplotlib
-# Set non-interactive backend to prevent GUI issues in background threads
-matplotlib.use('Agg')
+
+# Optional GPU backend for the SFS solver
+try:
+    import cupy
+    import cupyx.scipy.ndimage as cupy_ndimage
+except ImportError:
+    cupy = None
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
@@ -64,12 +73,16 @@ CONFIG = {
     "initial_surface": "flat",
     "max_iterations": 200,  # Increased for better convergence and feature capture
     "convergence_threshold": 5e-8,  # Tighter convergence for maximum accuracy
+    "stall_window": 30,  # Iterations over which residual improvement is measured
+    "stall_tolerance": 0.0,  # Stop once the best residual improves less than this fraction per window (0 = off)
+    "stall_min_iterations": 50,  # Never stop for a stall before this many iterations
     "regularization_lambda": 0.03,  # Reduced for better feature preservation
     "adaptive_regularization": True,
     "use_bilateral_filter": True,
     "bilateral_sigma_color": 0.03,  # Reduced for better edge preservation
     "bilateral_sigma_spatial": 2.0,  # Reduced for finer details
     "smoothing_factor": 0.2,  # Reduced to preserve maximum features
+    "sfs_backend": "cpu",  # "cuda" runs the solver on the GPU (requires CuPy)
     "gradient_threshold": 0.003,  # Lower threshold for better feature detection
 
     # --- Enhanced Feature Preservation Parameters ---
@@ -82,10 +95,16 @@ CONFIG = {
     # --- Output and Analysis Parameters ---
     "create_obj": True,
     "create_geotiff": True,
+    "geotiff_compression": "zstd",  # Or "lzw"/"deflate" for older GDAL readers
+    "geotiff_block_size": 256,  # Tile edge in pixels; must be a multiple of 16
     "create_visualizations": True,
+    "render_3d": True,  # mplot3d terrain figure; the slowest visualization
+    "figure_dpi": 200,  # 20-24 inch figures at 200 dpi are already 4000+ px wide
+    "png_compress_level": 1,  # Fastest zlib level for the large figure PNGs
     "perform_analysis": True,
     "save_intermediate_results": True,
     "verbose": True,
+    "analysis_block_rows": 512,  # Row band height for streamed terrain statistics
 
     # --- Supported Image Formats ---
     "supported_formats": [".png", ".jpg", ".jpeg", ".tif", ".tiff"],
@@ -159,6 +178,35 @@ def get_file_size_mb(filepath: str) -> float:
     """Get file size in MB"""
     return os.path.getsize(filepath) / (1024 * 1024)
 
+def compute_percentiles(data: np.ndarray, percentiles) -> np.ndarray:
+    """Linearly interpolated percentiles (as np.percentile) from one np.partition pass"""
+    flat = data.ravel()
+    positions = (flat.size - 1) * np.asarray(percentiles, dtype=np.float64) / 100
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, flat.size - 1)
+    # Partitioning on every needed rank at once shares a single partial sort
+    part = np.partition(flat, np.union1d(lower, upper))
+    low = part[lower].astype(np.float64)
+    return low + (part[upper] - low) * (positions - lower)
+
+
+def compute_moments(data: np.ndarray, block_size: int = 1 << 15) -> Tuple[float, float, float]:
+    """Mean, standard deviation and skewness, accumulated in float64 over cache-sized blocks"""
+    flat = data.ravel()
+    n = flat.size
+    mean = float(flat.mean(dtype=np.float64))
+    m2 = m3 = 0.0
+    # Only one block of deviations exists at a time, never a full-size temporary
+    for start in range(0, n, block_size):
+        deviation = flat[start:start + block_size].astype(np.float64)
+        deviation -= mean
+        squared = deviation * deviation
+        m2 += float(squared.sum())
+        m3 += float(np.dot(squared, deviation))
+    std = (m2 / n) ** 0.5
+    return mean, std, (m3 / n) / (std ** 3 + 1e-8)
+
+
 # ============================================================================
 # IMAGE PROCESSING AND LOADING
 # ============================================================================
@@ -168,11 +216,19 @@ def detect_images(data_dir: str) -> Dict[str, List[str]]:
     """Detect all supported image formats in the data directory"""
     print_step("Detecting images in data directory")
 
-    detected_images = {}
+    # One directory pass, partitioned by extension, instead of a glob per format
+    files_by_format = {fmt: [] for fmt in CONFIG["supported_formats"]}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            # Hidden files are skipped, as glob's '*' would
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            fmt = os.path.splitext(entry.name)[1].lower()
+            if fmt in files_by_format:
+                files_by_format[fmt].append(entry.path)
 
-    for fmt in CONFIG["supported_formats"]:
-        pattern = os.path.join(data_dir, f"*{fmt}")
-        files = glob.glob(pattern)
+    detected_images = {}
+    for fmt, files in files_by_format.items():
         if files:
             detected_images[fmt] = files
             print(f"  Found {len(files)} {fmt.upper()} files")
@@ -228,13 +284,41 @@ def select_best_image(detected_images: Dict[str, List[str]]) -> Optional[str]:
             return None
 
 
+# ITU-R BT.601 luma weights for RGB to grayscale conversion
+GRAYSCALE_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def read_image(image_path: str) -> np.ndarray:
+    """Read an image as (H, W) or (H, W, C) with channels in RGB(A) order"""
+    ext = os.path.splitext(image_path)[1].lower()
+    if ext in ('.tif', '.tiff'):
+        # GDAL reads TIFF blocks natively; bands come first
+        try:
+            with rasterio.open(image_path) as src:
+                image = src.read()
+            return image[0] if image.shape[0] == 1 else np.moveaxis(image, 0, -1)
+        except rasterio.errors.RasterioIOError:
+            pass
+    elif ext in ('.png', '.jpg', '.jpeg'):
+        image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        if image is not None:
+            if image.ndim == 3 and image.shape[2] == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            elif image.ndim == 3 and image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+            return image
+
+    # Anything the native readers can't handle
+    return imageio.imread(image_path)
+
+
 def load_and_validate_image(image_path: str) -> Tuple[np.ndarray, Dict[str, Any]]:
     """Load and validate image with comprehensive format support"""
     print_step(f"Loading image: {os.path.basename(image_path)}")
 
     try:
         # Load image
-        image = imageio.imread(image_path)
+        image = read_image(image_path)
 
         # Get image info
         info = {
@@ -247,24 +331,23 @@ def load_and_validate_image(image_path: str) -> Tuple[np.ndarray, Dict[str, Any]
 
         # Handle different image formats and bit depths
         if len(image.shape) == 3:
-            # Color image - convert to grayscale
-            if image.shape[2] == 3:  # RGB
-                image = np.dot(image, [0.299, 0.587, 0.114])
-            elif image.shape[2] == 4:  # RGBA
-                image = np.dot(image[:, :, :3], [0.299, 0.587, 0.114])
+            # Color image - convert to grayscale, straight to float32 rather
+            # than through a float64 copy of every channel
+            if image.shape[2] in (3, 4):  # RGB / RGBA
+                image = np.einsum('ijk,k->ij', image[:, :, :3], GRAYSCALE_WEIGHTS)
             info['converted_from'] = 'color'
         else:
             info['converted_from'] = 'grayscale'
 
         # Normalize to [0, 1] range
         if image.dtype == np.uint8:
-            image = image.astype(np.float64) / 255.0
+            image = np.divide(image, np.float32(255.0), dtype=np.float32)
         elif image.dtype == np.uint16:
-            image = image.astype(np.float64) / 65535.0
+            image = np.divide(image, np.float32(65535.0), dtype=np.float32)
         elif image.dtype in [np.float32, np.float64]:
-            image = image.astype(np.float64)
+            image = image.astype(np.float32)
             if image.max() > 1.0:
-                image = image / image.max()
+                image /= image.max()
 
         info['final_shape'] = image.shape
         info['final_dtype'] = image.dtype
@@ -302,6 +385,20 @@ def test_image_formats(detected_images: Dict[str, List[str]]) -> Dict[str, Any]:
         'errors': []
     }
 
+    # Decoding releases the GIL, so load every file concurrently up front;
+    # map() keeps input order, so the report below reads as before
+    def try_load(file_path: str) -> Optional[Exception]:
+        try:
+            load_and_validate_image(file_path)
+            return None
+        except Exception as e:
+            return e
+
+    all_files = [file_path for files in detected_images.values()
+                 for file_path in files]
+    with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, 8)) as executor:
+        load_errors = iter(list(executor.map(try_load, all_files)))
+
     for fmt, files in detected_images.items():
         print(f"\nTesting {fmt.upper()} format ({len(files)} files):")
 
@@ -314,12 +411,12 @@ def test_image_formats(detected_images: Dict[str, List[str]]) -> Dict[str, Any]:
 
         for file_path in files:
             test_results['total_images'] += 1
-            try:
-                image, info = load_and_validate_image(file_path)
+            e = next(load_errors)
+            if e is None:
                 format_results['successful'] += 1
                 test_results['successful_loads'] += 1
                 print(f"  ✓ {os.path.basename(file_path)}")
-            except Exception as e:
+            else:
                 format_results['failed'] += 1
                 format_results['errors'].append(
                     f"{os.path.basename(file_path)}: {str(e)}")
@@ -348,63 +445,225 @@ def compute_illumination_vector(azimuth_deg: float, elevation_deg: float) -> np.
     y = np.cos(el_rad) * np.cos(az_rad)
     z = np.sin(el_rad)
 
-    return np.array([x, y, z])
+    return np.array([x, y, z], dtype=np.float32)
+
 
+def compute_gradients(surface: np.ndarray,
+                      out: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute surface gradients using central differences
 
-def compute_gradients(surface: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-    """Compute surface gradients using central differences"""
+    Writes into the (grad_x, grad_y) arrays in out when given.
+    """
     # Compute gradients with proper boundary handling
-    grad_x = np.zeros_like(surface)
-    grad_y = np.zeros_like(surface)
+    if out is None:
+        grad_x = np.empty_like(surface)
+        grad_y = np.empty_like(surface)
+    else:
+        grad_x, grad_y = out
 
     # Interior points
-    grad_x[1:-1, 1:-1] = (surface[1:-1, 2:] - surface[1:-1, :-2]) / 2.0
-    grad_y[1:-1, 1:-1] = (surface[2:, 1:-1] - surface[:-2, 1:-1]) / 2.0
+    np.subtract(surface[1:-1, 2:], surface[1:-1, :-2], out=grad_x[1:-1, 1:-1])
+    grad_x[1:-1, 1:-1] /= 2.0
+    np.subtract(surface[2:, 1:-1], surface[:-2, 1:-1], out=grad_y[1:-1, 1:-1])
+    grad_y[1:-1, 1:-1] /= 2.0
 
-    # Boundary points
-    grad_x[0, :] = surface[1, :] - surface[0, :]
-    grad_x[-1, :] = surface[-1, :] - surface[-2, :]
-    grad_x[:, 0] = surface[:, 1] - surface[:, 0]
-    grad_x[:, -1] = surface[:, -1] - surface[:, -2]
+    # Boundary points: one-sided differences, shared by both gradients, so
+    # each edge is computed once into grad_x and copied to grad_y
+    np.subtract(surface[1, :], surface[0, :], out=grad_x[0, :])
+    np.subtract(surface[-1, :], surface[-2, :], out=grad_x[-1, :])
+    np.subtract(surface[:, 1], surface[:, 0], out=grad_x[:, 0])
+    np.subtract(surface[:, -1], surface[:, -2], out=grad_x[:, -1])
 
-    grad_y[0, :] = surface[1, :] - surface[0, :]
-    grad_y[-1, :] = surface[-1, :] - surface[-2, :]
-    grad_y[:, 0] = surface[:, 1] - surface[:, 0]
-    grad_y[:, -1] = surface[:, -1] - surface[:, -2]
+    grad_y[[0, -1], :] = grad_x[[0, -1], :]
+    grad_y[:, [0, -1]] = grad_x[:, [0, -1]]
 
     return grad_x, grad_y
 
 
-def compute_reflectance_map(grad_x: np.ndarray, grad_y: np.ndarray,
-                            light_vector: np.ndarray) -> np.ndarray:
-    """Compute reflectance map from gradients and illumination"""
-    # Compute surface normals
-    norm_factor = np.sqrt(grad_x**2 + grad_y**2 + 1)
-
-    # Normal vectors
-    nx = -grad_x / norm_factor
-    ny = -grad_y / norm_factor
-    nz = 1.0 / norm_factor
-
-    # Compute dot product with light vector
-    reflectance = np.maximum(
-        0, nx * light_vector[0] + ny * light_vector[1] + nz * light_vector[2])
-
-    return reflectance
+if cupy is not None:
+    # max(0, (lz - lx*gx - ly*gy) / sqrt(gx^2 + gy^2 + 1)) per pixel on the GPU
+    _cuda_reflectance_kernel = cupy.ElementwiseKernel(
+        'T gx, T gy, T lx, T ly, T lz', 'T r',
+        'r = (lz - lx * gx - ly * gy) / sqrt(gx * gx + gy * gy + (T)1); if (r < 0) r = 0;',
+        'sfs_reflectance')
+
+
+def make_reflectance_map(light_vector: np.ndarray) -> Callable[..., np.ndarray]:
+    """Build a reflectance map function specialized to one light vector
+
+    The returned function takes (gradients, out=None, scratch=None), where
+    gradients stacks (grad_x, grad_y) as a (2, H, W) array, and uses the out
+    and scratch buffers, when given, instead of allocating.
+    """
+    # The light vector is fixed for a whole solve, so its terms are
+    # resolved once here rather than sliced and negated on every call
+    light_xy = -np.asarray(light_vector[:2])
+    light_z = light_vector[2]
+
+    def reflectance_map(gradients: np.ndarray, out: Optional[np.ndarray] = None,
+                        scratch: Optional[np.ndarray] = None) -> np.ndarray:
+        if not isinstance(gradients, np.ndarray):
+            # CuPy arrays: the same formula as one fused GPU kernel
+            return _cuda_reflectance_kernel(gradients[0], gradients[1],
+                                            -light_xy[0], -light_xy[1], light_z, out)
+        if out is None:
+            out = np.empty_like(gradients[0])
+        if scratch is None:
+            scratch = np.empty_like(gradients[0])
+
+        # Fused form of max(0, n . L) with n = (-gx, -gy, 1) / |(-gx, -gy, 1)|:
+        # (lz - lx*gx - ly*gy) / sqrt(gx^2 + gy^2 + 1), each term in one pass
+        norm_factor = np.einsum('kij,kij->ij', gradients, gradients, out=scratch)
+        norm_factor += 1
+        np.sqrt(norm_factor, out=norm_factor)
+
+        reflectance = np.einsum('kij,k->ij', gradients, light_xy, out=out)
+        reflectance += light_z
+        reflectance /= norm_factor
+
+        return np.maximum(reflectance, 0, out=reflectance)
+
+    return reflectance_map
+
+
+def compute_reflectance_map(gradients: np.ndarray, light_vector: np.ndarray,
+                            out: Optional[np.ndarray] = None,
+                            scratch: Optional[np.ndarray] = None) -> np.ndarray:
+    """Compute reflectance map from gradients and illumination
+
+    gradients stacks (grad_x, grad_y) as a (2, H, W) array. Uses the out and
+    scratch buffers, when given, instead of allocating.
+    """
+    return make_reflectance_map(light_vector)(gradients, out, scratch)
+
+
+def gaussian_blur(image: np.ndarray, sigma: float,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Gaussian smoothing with OpenCV, matching scipy's gaussian_filter defaults"""
+    if not isinstance(image, np.ndarray):
+        # CuPy arrays; filtered separately since out may alias the input
+        filtered = cupy_ndimage.gaussian_filter(image, sigma)
+        if out is None:
+            return filtered
+        out[...] = filtered
+        return out
+    # Same kernel radius (truncate=4.0) and 'reflect' border as scipy
+    radius = int(4.0 * sigma + 0.5)
+    ksize = 2 * radius + 1
+    return cv2.GaussianBlur(image, (ksize, ksize), dst=out, sigmaX=sigma, sigmaY=sigma,
+                            borderType=cv2.BORDER_REFLECT)
+
+
+def laplacian(image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """5-point Laplacian with OpenCV, matching scipy's laplace defaults"""
+    if not isinstance(image, np.ndarray):
+        return cupy_ndimage.laplace(image, output=out)
+    return cv2.Laplacian(image, cv2.CV_32F if image.dtype == np.float32 else cv2.CV_64F,
+                         dst=out, ksize=1, borderType=cv2.BORDER_REFLECT)
 
 
 def bilateral_filter(image: np.ndarray, sigma_color: float, sigma_spatial: float) -> np.ndarray:
     """Apply bilateral filter for edge-preserving smoothing"""
-    from scipy.ndimage import gaussian_filter
-
     # Simple bilateral filter approximation
-    filtered = gaussian_filter(image, sigma_spatial)
-
-    # Apply color-based weighting
-    weights = np.exp(-0.5 * ((image - filtered) / sigma_color)**2)
-    result = weights * image + (1 - weights) * filtered
+    filtered = gaussian_blur(image, sigma_spatial)
+
+    # Apply color-based weighting:
+    # weights * image + (1 - weights) * filtered == filtered + weights * detail
+    detail = np.subtract(image, filtered)
+    weights = np.divide(detail, sigma_color)
+    np.square(weights, out=weights)
+    weights *= -0.5
+    np.exp(weights, out=weights)
+    detail *= weights
+    filtered += detail
+
+    return filtered
+
+
+def compute_edge_weight(image: np.ndarray) -> np.ndarray:
+    """Edge-aware objective weights, 1 on flat areas up to 4 on the strongest edges"""
+    # Compute image gradients for edge detection
+    image_grad_x, image_grad_y = np.gradient(image)
+    image_grad_mag = np.hypot(image_grad_x, image_grad_y)
+
+    # Edge-aware weighting - preserve features with high gradients
+    return 1.0 + 3.0 * image_grad_mag / (image_grad_mag.max() + 1e-8)
+
+
+def _sfs_step(surface: np.ndarray, momentum: np.ndarray, image: np.ndarray,
+              edge_weight: Optional[np.ndarray], reflectance_map: Callable[..., np.ndarray],
+              iteration: int, config: Dict[str, Any],
+              work: np.ndarray) -> Tuple[float, float, float, float]:
+    """Run one SFS update, modifying surface and momentum in place
+
+    edge_weight comes from compute_edge_weight, or is None to skip feature
+    enhancement; reflectance_map from make_reflectance_map. work is a
+    (5, H, W) stack of buffers reused across iterations.
+    Returns (total residual, mean absolute objective gradient, step size,
+    mean absolute surface change).
+    """
+    lambda_reg = config["regularization_lambda"]
+    gradients, (grad_x, grad_y, R_computed, objective, scratch) = work[:2], work
+
+    # Compute gradients with enhanced accuracy
+    compute_gradients(surface, out=(grad_x, grad_y))
+
+    # Compute reflectance map
+    reflectance_map(gradients, out=R_computed, scratch=scratch)
+
+    # Compute residual with enhanced weighting
+    residual = np.subtract(R_computed, image, out=objective)
+    total_residual = float(np.sum(np.square(residual, out=scratch)))
+
+    # Enhanced gradient computation for better feature preservation
+    grad_objective = residual
+    grad_objective *= 2
+
+    # Adaptive edge-aware weighting for maximum feature preservation
+    if edge_weight is not None:
+        grad_objective *= edge_weight
+
+    # Apply regularization with feature-preserving adaptive strength
+    if lambda_reg > 0:
+        # The reflectance buffer is free once the residual is taken
+        laplacian_surface = laplacian(surface, out=R_computed)
+        if config["adaptive_regularization"]:
+            # Adaptive regularization that preserves features:
+            # lambda * (0.5 + 0.5 * (1 - mask)), reduced where features are strong
+            feature_mask = np.hypot(grad_x, grad_y, out=scratch)
+            feature_mask /= feature_mask.max() + 1e-8
+            reg_weight = np.subtract(1.0, feature_mask, out=scratch)
+            reg_weight *= 0.5
+            reg_weight += 0.5
+            reg_weight *= lambda_reg
+            reg_weight *= laplacian_surface
+            grad_objective += reg_weight
+        else:
+            laplacian_surface *= lambda_reg
+            grad_objective += laplacian_surface
+
+    # Enhanced adaptive step size with improved momentum
+    if config["adaptive_regularization"]:
+        # More conservative step size for better accuracy
+        base_step = 0.012
+        step_size = base_step / (1 + iteration * 0.0003)
+
+        # Improved momentum with adaptive decay
+        momentum_factor = 0.85 / (1 + iteration * 0.001)
+        momentum *= momentum_factor
+        momentum -= np.multiply(grad_objective, step_size, out=scratch)
+
+        # Update surface with momentum
+        surface += momentum
+        surface_change = float(np.mean(np.abs(momentum, out=scratch)))
+    else:
+        step_size = 0.01
+        update = np.multiply(grad_objective, step_size, out=scratch)
+        surface -= update
+        surface_change = float(np.mean(np.abs(update, out=update)))
 
-    return result
+    grad_mean = float(np.mean(np.abs(grad_objective, out=scratch)))
+    return total_residual, grad_mean, step_size, surface_change
 
 
 def optimize_surface_sfs(image: np.ndarray, light_vector: np.ndarray,
@@ -414,106 +673,88 @@ def optimize_surface_sfs(image: np.ndarray, light_vector: np.ndarray,
 
     h, w = image.shape
 
+    # The solver runs in float32: photoclinometry needs nowhere near float64
+    # precision, and every pass over the grid is memory-bound
+    image = image.astype(np.float32, copy=False)
+    light_vector = np.asarray(light_vector, dtype=np.float32)
+
+    # On the GPU backend every solver array lives in device memory; NumPy
+    # calls below dispatch to CuPy for them, and only the result comes back
+    use_cuda = config.get("sfs_backend", "cpu") == "cuda"
+    if use_cuda and cupy is None:
+        print("  ⚠️  CuPy is not installed, running SFS on the CPU")
+        use_cuda = False
+    xp = cupy if use_cuda else np
+
     # Initialize surface
     if config["initial_surface"] == "flat":
-        surface = np.zeros((h, w), dtype=np.float64)
+        surface = np.zeros((h, w), dtype=np.float32)
     elif config["initial_surface"] == "random":
-        surface = np.random.normal(0, 0.1, (h, w))
+        surface = np.random.normal(0, 0.1, (h, w)).astype(np.float32)
     else:
-        surface = np.zeros((h, w), dtype=np.float64)
+        surface = np.zeros((h, w), dtype=np.float32)
+    image = xp.asarray(image)
+    surface = xp.asarray(surface)
 
     # Optimization parameters
     max_iter = config["max_iterations"]
     conv_threshold = config["convergence_threshold"]
-    lambda_reg = config["regularization_lambda"]
+    stall_window = config.get("stall_window", 30)
+    stall_tolerance = config.get("stall_tolerance", 0.0)
+    stall_min_iterations = config.get("stall_min_iterations", 50)
+    if stall_tolerance > 0 and stall_window < 1:
+        raise ValueError("stall_window must be at least 1 iteration")
 
     # Tracking variables
     history = {
         'residuals': [],
         'gradients': [],
         'convergence': [],
-        'iterations': 0
+        'iterations': 0,
+        'stalled': False
     }
 
     print(f"  Initial surface: {config['initial_surface']}")
     print(f"  Max iterations: {max_iter}")
     print(f"  Convergence threshold: {conv_threshold}")
-
-    # Optimization loop with enhanced accuracy
-    prev_momentum = np.zeros_like(surface)
+    print(f"  Backend: {'cuda' if use_cuda else 'cpu'}")
+
+    # Optimization loop with enhanced accuracy; the step works in place on
+    # these buffers instead of allocating fresh arrays every iteration
+    momentum = np.zeros_like(surface)
+    work = xp.empty((5, h, w), dtype=surface.dtype)
+    # The image never changes, so its edge weighting is computed once
+    edge_weight = (compute_edge_weight(image)
+                   if config.get("feature_enhancement", True) else None)
+    # Only filtered iterations need the previous surface to measure change;
+    # otherwise the step reports it from the update it applied
+    prev_surface = np.empty_like(surface)
+    reflectance_map = make_reflectance_map(light_vector)
+    best_before_window = np.inf
     with tqdm(total=max_iter, desc="  SFS Optimization") as pbar:
         for iteration in range(max_iter):
-            # Store previous surface for convergence check
-            prev_surface = surface.copy()
-
-            # Compute gradients with enhanced accuracy
-            grad_x, grad_y = compute_gradients(surface)
-
-            # Compute reflectance map
-            R_computed = compute_reflectance_map(grad_x, grad_y, light_vector)
-
-            # Compute residual with enhanced weighting
-            residual = R_computed - image
-            total_residual = np.sum(residual**2)
-
-            # Enhanced gradient computation for better feature preservation
-            grad_objective = 2 * residual
-
-            # Adaptive edge-aware weighting for maximum feature preservation
-            if config.get("feature_enhancement", True):
-                # Compute image gradients for edge detection
-                image_grad_x, image_grad_y = np.gradient(image)
-                image_grad_mag = np.sqrt(image_grad_x**2 + image_grad_y**2)
-
-                # Edge-aware weighting - preserve features with high gradients
-                edge_weight = 1.0 + 3.0 * image_grad_mag / \
-                    (image_grad_mag.max() + 1e-8)
-                grad_objective *= edge_weight
-
-            # Apply regularization with feature-preserving adaptive strength
-            if lambda_reg > 0:
-                laplacian = laplace(surface)
-                if config["adaptive_regularization"]:
-                    # Adaptive regularization that preserves features
-                    surface_grad_mag = np.sqrt(grad_x**2 + grad_y**2)
-                    # Reduce regularization where there are strong features
-                    feature_mask = surface_grad_mag / \
-                        (surface_grad_mag.max() + 1e-8)
-                    reg_weight = lambda_reg * \
-                        (0.5 + 0.5 * (1.0 - feature_mask))
-                    grad_objective += reg_weight * laplacian
-                else:
-                    grad_objective += lambda_reg * laplacian
-
-            # Enhanced adaptive step size with improved momentum
-            if config["adaptive_regularization"]:
-                # More conservative step size for better accuracy
-                base_step = 0.012
-                step_size = base_step / (1 + iteration * 0.0003)
-
-                # Improved momentum with adaptive decay
-                momentum_factor = 0.85 / (1 + iteration * 0.001)
-                momentum = momentum_factor * prev_momentum - step_size * grad_objective
-                prev_momentum = momentum
-
-                # Update surface with momentum
-                surface += momentum
-            else:
-                step_size = 0.01
-                surface -= step_size * grad_objective
-
             # Apply bilateral filter for edge preservation less frequently for better accuracy
-            if config["use_bilateral_filter"] and iteration % 10 == 0:
+            apply_filter = config["use_bilateral_filter"] and iteration % 10 == 0
+            if apply_filter:
+                # Store previous surface for convergence check
+                np.copyto(prev_surface, surface)
+
+            total_residual, grad_mean, step_size, surface_change = _sfs_step(
+                surface, momentum, image, edge_weight, reflectance_map, iteration,
+                config, work)
+
+            if apply_filter:
                 surface = bilateral_filter(surface,
                                            config["bilateral_sigma_color"],
                                            config["bilateral_sigma_spatial"])
 
-            # Check convergence
-            surface_change = np.mean(np.abs(surface - prev_surface))
+                # Check convergence
+                change = np.subtract(surface, prev_surface, out=prev_surface)
+                surface_change = float(np.mean(np.abs(change, out=change)))
 
             # Record history
             history['residuals'].append(total_residual)
-            history['gradients'].append(np.mean(np.abs(grad_objective)))
+            history['gradients'].append(grad_mean)
             history['convergence'].append(surface_change)
 
             # Update progress bar
@@ -529,10 +770,26 @@ def optimize_surface_sfs(image: np.ndarray, light_vector: np.ndarray,
                 print(f"  Converged after {iteration + 1} iterations")
                 break
 
+            # Stop once no iteration in the last window has beaten the best
+            # residual seen before it by the tolerance; comparing whole windows
+            # keeps the bilateral filter cycle from looking like a plateau
+            residuals = history['residuals']
+            if stall_tolerance > 0 and len(residuals) > stall_window:
+                best_before_window = min(best_before_window,
+                                         residuals[-1 - stall_window])
+                if (iteration >= stall_min_iterations
+                        and min(residuals[-stall_window:])
+                        > best_before_window * (1 - stall_tolerance)):
+                    print(f"  Residual plateaued after {iteration + 1} iterations")
+                    history['stalled'] = True
+                    break
+
     history['iterations'] = iteration + 1
 
-    # Final smoothing
-    surface = gaussian_filter(surface, config["smoothing_factor"])
+    # Final smoothing, in place
+    surface = gaussian_blur(surface, config["smoothing_factor"], out=surface)
+    if use_cuda:
+        surface = cupy.asnumpy(surface)
 
     print(f"  Final residual: {history['residuals'][-1]:.2e}")
     print(f"  Surface range: [{surface.min():.3f}, {surface.max():.3f}]")
@@ -548,6 +805,9 @@ def scale_dem_to_physical(surface: np.ndarray, config: Dict[str, Any]) -> np.nda
     """Scale DEM to physical units with enhanced accuracy for maximum lunar feature preservation"""
     print_step("Scaling DEM to physical units with maximum feature preservation")
 
+    # Heights fit comfortably in float32; halves memory traffic below
+    surface = np.ascontiguousarray(surface, dtype=np.float32)
+
     # Preserve the original surface characteristics for feature analysis
     original_range = surface.max() - surface.min()
     original_std = surface.std()
@@ -555,12 +815,15 @@ def scale_dem_to_physical(surface: np.ndarray, config: Dict[str, Any]) -> np.nda
 
     if config.get("adaptive_normalization", True):
         # Use robust percentile-based scaling to preserve all lunar features
-        p1, p99 = np.percentile(surface, [1, 99])  # Keep more extreme values
+        # Keep more extreme values; the median comes from the same partition.
+        # Plain floats keep the arithmetic below in float32
+        p1, surface_median, p99 = compute_percentiles(
+            surface, [1, 50, 99]).tolist()
 
         # Robust normalization that preserves outliers (important lunar features)
         if p99 > p1:
             # Use robust center and scale
-            surface_center = np.median(surface)
+            surface_center = surface_median
             surface_scale = p99 - p1
 
             # Normalize while preserving extreme features
@@ -581,8 +844,7 @@ def scale_dem_to_physical(surface: np.ndarray, config: Dict[str, Any]) -> np.nda
     if config.get("feature_enhancement", True):
         # Enhanced contrast adjustment that preserves lunar terrain features
         # Use adaptive gamma correction based on surface statistics
-        surface_skew = np.mean(
-            (surface_norm - surface_norm.mean())**3) / (surface_norm.std()**3 + 1e-8)
+        _, _, surface_skew = compute_moments(surface_norm)
 
         if surface_skew > 0.1:  # Positively skewed (more craters)
             gamma = 0.7  # Enhance darker regions (craters)
@@ -591,11 +853,13 @@ def scale_dem_to_physical(surface: np.ndarray, config: Dict[str, Any]) -> np.nda
         else:
             gamma = 0.85  # Balanced enhancement
 
-        surface_norm = np.power(surface_norm, gamma)
+        # surface_norm is always a fresh array here, so raise it in place
+        np.power(surface_norm, gamma, out=surface_norm)
 
     # Scale to realistic lunar height range with feature preservation
     height_range = config["dem_max_height"] - config["dem_min_height"]
-    dem_scaled = config["dem_min_height"] + surface_norm * height_range
+    dem_scaled = (config["dem_min_height"] + surface_norm *
+                  height_range).astype(np.float32, copy=False)
 
     # Quality metrics for accuracy assessment
     final_range = dem_scaled.max() - dem_scaled.min()
@@ -627,8 +891,23 @@ def create_geotiff(dem: np.ndarray, output_path: str, config: Dict[str, Any]):
         width=w, height=h
     )
 
+    # ZSTD writes faster and smaller than LZW; floating-point prediction
+    # (3) suits float DEMs, horizontal differencing (2) integer ones
+    compression = config.get("geotiff_compression", "zstd")
+    creation_options = {
+        "compress": compression,
+        "predictor": 3 if np.issubdtype(dem.dtype, np.floating) else 2
+    }
+    if compression.lower() == "zstd":
+        creation_options["zstd_level"] = 1
+
+    # Tiles are compressed independently, so GDAL can spread them over all
+    # cores; the layout also serves windowed reads downstream
+    block_size = config.get("geotiff_block_size", 256)
+    creation_options.update(tiled=True, blockxsize=block_size, blockysize=block_size)
+
     # Create GeoTIFF
-    with rasterio.open(
+    with rasterio.Env(GDAL_NUM_THREADS='ALL_CPUS'), rasterio.open(
         output_path,
         'w',
         driver='GTiff',
@@ -638,7 +917,7 @@ def create_geotiff(dem: np.ndarray, output_path: str, config: Dict[str, Any]):
         dtype=dem.dtype,
         crs='+proj=utm +zone=1 +datum=WGS84 +units=m +no_defs',
         transform=transform,
-        compress='lzw'
+        **creation_options
     ) as dst:
         dst.write(dem, 1)
 
@@ -652,6 +931,15 @@ def create_geotiff(dem: np.ndarray, output_path: str, config: Dict[str, Any]):
     print(f"  GeoTIFF saved: {output_path}")
 
 
+def _format_obj_lines(line_format: str, rows: np.ndarray, chunk_rows: int = 65536):
+    """Yield OBJ text for an (N, 3) array, one %-format call per chunk of rows"""
+    # A single format over a whole chunk keeps the per-value work in C, while
+    # chunking bounds the temporary tuple and string for very large DEMs
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        yield (line_format * len(chunk)) % tuple(chunk.ravel().tolist())
+
+
 def create_obj_file(dem: np.ndarray, output_path: str, config: Dict[str, Any]):
     """Create OBJ 3D model file from DEM"""
     print_step("Creating OBJ 3D model")
@@ -659,60 +947,73 @@ def create_obj_file(dem: np.ndarray, output_path: str, config: Dict[str, Any]):
     h, w = dem.shape
     pixel_size = config["pixel_size_meters"]
 
-    vertices = []
-    faces = []
-
-    # Generate vertices
-    for i in range(h):
-        for j in range(w):
-            x = j * pixel_size
-            y = i * pixel_size
-            z = dem[i, j]
-            vertices.append(f"v {x} {y} {z}")
-
-    # Generate faces (triangles)
-    for i in range(h - 1):
-        for j in range(w - 1):
-            # Vertex indices (1-based for OBJ format)
-            v1 = i * w + j + 1
-            v2 = i * w + j + 2
-            v3 = (i + 1) * w + j + 1
-            v4 = (i + 1) * w + j + 2
-
-            # Two triangles per quad
-            faces.append(f"f {v1} {v2} {v3}")
-            faces.append(f"f {v2} {v4} {v3}")
-
-    # Write OBJ file
-    with open(output_path, 'w') as f:
-        f.write("# Luna Photoclinometry OBJ Model\n")
-        f.write("# Generated by Luna Unified System\n\n")
-
-        # Write vertices
-        for vertex in vertices:
-            f.write(vertex + "\n")
-
-        f.write("\n")
-
-        # Write faces
-        for face in faces:
-            f.write(face + "\n")
+    # Generate vertices: one (x, y, z) row per pixel, row-major
+    rows, cols = np.meshgrid(np.arange(h), np.arange(w), indexing='ij')
+    vertices = np.column_stack([(cols * pixel_size).ravel(),
+                                (rows * pixel_size).ravel(),
+                                dem.ravel()])
+
+    # Generate faces (triangles): two per quad, from the 1-based (OBJ) index
+    # of each quad's top-left vertex
+    v1 = (np.arange(h - 1)[:, None] * w + np.arange(w - 1)[None, :]).ravel() + 1
+    v2, v3, v4 = v1 + 1, v1 + w, v1 + w + 1
+    faces = np.stack([np.column_stack([v1, v2, v3]),
+                      np.column_stack([v2, v4, v3])], axis=1).reshape(-1, 3)
+
+    # Enough significant digits to round-trip the DEM's float precision
+    digits = 9 if dem.dtype == np.float32 else 17
+
+    # Write OBJ file as one stream of chunk-sized blocks; newline='\n' keeps
+    # the output byte-identical across platforms with no line-ending pass
+    with open(output_path, 'w', encoding='ascii', newline='\n') as f:
+        f.writelines(itertools.chain(
+            ("# Luna Photoclinometry OBJ Model\n"
+             "# Generated by Luna Unified System\n\n",),
+            _format_obj_lines(f"v %.{digits}g %.{digits}g %.{digits}g\n", vertices),
+            ("\n",),
+            _format_obj_lines("f %d %d %d\n", faces)))
 
     print(
         f"  OBJ file saved: {output_path} ({len(vertices)} vertices, {len(faces)} faces)")
 
 
+def plot_histogram(ax, data: np.ndarray, bins, counts_edges=None, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """Bin data with np.histogram and draw the counts as one filled step patch"""
+    if counts_edges is None:
+        counts_edges = np.histogram(data.ravel(), bins=bins)
+    counts, edges = counts_edges
+    # A single StepPatch instead of one Rectangle per bin; 'color' fills it
+    # so that an explicit edgecolor still outlines it
+    ax.stairs(counts, edges, fill=True, facecolor=kwargs.pop('color', None), **kwargs)
+    return counts, edges
+
+
+def save_png_fast(path: str, image: np.ndarray):
+    """Write a uint8 image straight to PNG, skipping matplotlib rendering"""
+    # compress_level=1 encodes several times faster than the default of 6
+    imageio.imwrite(path, image, format='PNG', compress_level=1)
+
+
 def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarray,
                           history: Dict[str, Any], output_dir: str):
     """Create ultra-high-quality visualizations with crystal-clear DEM images"""
     print_step("Creating ultra-high-quality lunar surface visualizations")
 
+    # matplotlib renders in float32 anyway, so cast once up front
+    surface = np.ascontiguousarray(surface, dtype=np.float32)
+    dem = np.ascontiguousarray(dem, dtype=np.float32)
+
     # Set up matplotlib for maximum quality
     plt.style.use('default')
     plt.rcParams['figure.dpi'] = 300
-    plt.rcParams['savefig.dpi'] = 300
+    plt.rcParams['savefig.dpi'] = CONFIG.get("figure_dpi", 200)
     plt.rcParams['font.size'] = 10
     plt.rcParams['axes.titleweight'] = 'bold'
+    # PNG encoding of the large figures is zlib-bound, so trade size for speed
+    png_options = {'compress_level': CONFIG.get("png_compress_level", 1)}
+
+    # Elevation statistics shared by every figure below
+    dem_min, dem_max, dem_mean, dem_std = compute_dem_statistics(dem)
 
     # 1. Create Ultra-High-Quality Main Analysis Figure
     fig, axes = plt.subplots(2, 2, figsize=(24, 20))
@@ -753,7 +1054,7 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
 
     # ULTRA-HIGH-QUALITY Digital Elevation Model with maximum clarity
     im2 = axes[1, 0].imshow(dem, cmap='terrain', interpolation='bilinear', aspect='equal',
-                            vmin=dem.min(), vmax=dem.max())
+                            vmin=dem_min, vmax=dem_max)
     axes[1, 0].set_title('Mission-Ready Digital Elevation Model\n(Disparity Map with Absolute Height Values)',
                          fontsize=14, fontweight='bold', pad=20)
     axes[1, 0].axis('off')
@@ -770,12 +1071,12 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
         spine.set_edgecolor('black')
 
     # Enhanced histogram with maximum accuracy and clarity
-    height_range = dem.max() - dem.min()
-    dem_mean = dem.mean()
-    dem_median = np.median(dem)
-    dem_std = dem.std()
-    dem_q1 = np.percentile(dem, 25)
-    dem_q3 = np.percentile(dem, 75)
+    height_range = dem_max - dem_min
+    # Flatten once (a view of the contiguous DEM) and take every quantile
+    # the figures need from a single partition
+    dem_flat = dem.ravel()
+    dem_p1, dem_q1, dem_median, dem_q3, dem_p99 = compute_percentiles(
+        dem_flat, [1, 25, 50, 75, 99])
     iqr = dem_q3 - dem_q1
 
     # More accurate feature thresholds
@@ -783,8 +1084,8 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
     ridge_height_threshold = dem_q3 + 1.5 * iqr
 
     # Optimal binning for ultra-clear histogram
+    n_samples = dem_flat.size
     if CONFIG.get("histogram_bins") == "auto":
-        n_samples = len(dem.flatten())
         scott_bin_width = 3.5 * dem_std / (n_samples ** (1/3))
         if scott_bin_width > 0:
             n_bins = max(50, min(200, int(height_range / scott_bin_width)))
@@ -793,12 +1094,9 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
     else:
         n_bins = CONFIG.get("histogram_bins", 102)
 
-    dem_data = dem.flatten()
-
     # Create ultra-clear histogram with enhanced visual quality
-    counts, bins, patches = axes[1, 1].hist(dem_data, bins=n_bins, alpha=0.85,
-                                            color='lightcoral', edgecolor='darkred',
-                                            linewidth=1.2, density=False)
+    plot_histogram(axes[1, 1], dem_flat, n_bins, alpha=0.85,
+                   color='lightcoral', edgecolor='darkred', linewidth=1.2)
 
     # Enhanced statistical lines with perfect clarity
     axes[1, 1].axvline(dem_mean, color='blue', linestyle='--', linewidth=4,
@@ -811,7 +1109,7 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
                        label=f'Ridge Threshold: {ridge_height_threshold:.1f}m', alpha=0.95)
 
     # Enhanced title and labels
-    skewness = np.mean(((dem_data - dem_mean) / dem_std)**3)
+    _, _, skewness = compute_moments(dem_flat)
     axes[1, 1].set_title(f'High-Accuracy Lunar Elevation Distribution\nRange: {height_range:.1f}m | σ: {dem_std:.1f}m | Bins: {n_bins} | Skew: {skewness:.2f}',
                          fontsize=14, fontweight='bold', pad=20)
     axes[1, 1].set_xlabel('Elevation (m)', fontweight='bold', fontsize=13)
@@ -822,7 +1120,7 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
     axes[1, 1].tick_params(labelsize=11)
 
     # Enhanced statistics box
-    stats_text = f'Min: {dem.min():.1f}m\nMax: {dem.max():.1f}m\nIQR: {iqr:.1f}m\nSamples: {n_samples:,}'
+    stats_text = f'Min: {dem_min:.1f}m\nMax: {dem_max:.1f}m\nIQR: {iqr:.1f}m\nSamples: {n_samples:,}'
     axes[1, 1].text(0.02, 0.98, stats_text, transform=axes[1, 1].transAxes,
                     fontsize=11, verticalalignment='top',
                     bbox=dict(boxstyle='round,pad=0.6', facecolor='wheat', alpha=0.95,
@@ -830,7 +1128,8 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
 
     plt.tight_layout(rect=[0, 0.03, 1, 0.96])
     plt.savefig(os.path.join(output_dir, 'lunar_surface_analysis.png'),
-                dpi=500, bbox_inches='tight', facecolor='white', edgecolor='none')
+                bbox_inches='tight', facecolor='white', edgecolor='none',
+                pil_kwargs=png_options)
     plt.close()
 
     # 2. Create SEPARATE Ultra-High-Quality DEM Image (like your reference)
@@ -843,16 +1142,14 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
     ax_dem = fig_dem.add_subplot(111)
 
     # Prepare DEM data for ultra-clear visualization
-    from scipy.ndimage import gaussian_filter, median_filter
-
     # Apply minimal noise reduction while preserving all features
-    dem_clean = median_filter(dem, size=2)  # Remove single-pixel noise
+    dem_clean = cv2.medianBlur(dem, 3)  # Remove single-pixel noise
     # Minimal smoothing for clarity
-    dem_enhanced = gaussian_filter(dem_clean, sigma=0.3)
+    dem_enhanced = gaussian_blur(dem_clean, 0.3)
 
     # Create ultra-high-quality DEM image with perfect clarity
     im_dem = ax_dem.imshow(dem_enhanced, cmap='terrain', interpolation='bilinear',
-                           aspect='equal', vmin=dem.min(), vmax=dem.max())
+                           aspect='equal', vmin=dem_min, vmax=dem_max)
 
     ax_dem.set_title('Ultra-High-Quality Lunar Digital Elevation Model\n(Crystal-Clear Photoclinometry Analysis)',
                      fontsize=18, fontweight='bold', pad=35)
@@ -865,7 +1162,8 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
 
     plt.tight_layout()
     plt.savefig(os.path.join(output_dir, 'ultra_clear_dem.png'),
-                dpi=600, bbox_inches='tight', facecolor='white', edgecolor='none')
+                bbox_inches='tight', facecolor='white', edgecolor='none',
+                pil_kwargs=png_options)
     plt.close()
 
     # Version 2: Raw High-Contrast DEM (Maximum Feature Detail)
@@ -873,10 +1171,10 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
     ax_raw = fig_raw.add_subplot(111)
 
     # Use raw DEM data with enhanced contrast for maximum feature visibility
-    dem_contrast = np.clip(dem, np.percentile(dem, 1), np.percentile(dem, 99))
+    dem_contrast = np.clip(dem, dem_p1, dem_p99)
 
     im_raw = ax_raw.imshow(dem_contrast, cmap='viridis', interpolation='none',
-                           aspect='equal', vmin=dem_contrast.min(), vmax=dem_contrast.max())
+                           aspect='equal', vmin=dem_p1, vmax=dem_p99)
 
     ax_raw.set_title('High-Contrast Lunar DEM (Maximum Feature Resolution)\n(Unfiltered Photoclinometry Data)',
                      fontsize=18, fontweight='bold', pad=35)
@@ -888,18 +1186,20 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
 
     plt.tight_layout()
     plt.savefig(os.path.join(output_dir, 'high_contrast_dem.png'),
-                dpi=600, bbox_inches='tight', facecolor='white', edgecolor='none')
+                bbox_inches='tight', facecolor='white', edgecolor='none',
+                pil_kwargs=png_options)
     plt.close()
 
     # Version 3: Publication-Quality DEM (Professional Format)
     fig_pub = plt.figure(figsize=(24, 18))
     ax_pub = fig_pub.add_subplot(111)
 
-    # Apply professional-grade enhancement for publication
-    dem_pub = gaussian_filter(dem_clean, sigma=0.4)
+    # Apply professional-grade enhancement for publication: Gaussians
+    # compose, so sigma 0.4 is sigma 0.3 plus sqrt(0.4² - 0.3²) on top
+    dem_pub = gaussian_blur(dem_enhanced, np.sqrt(0.4 ** 2 - 0.3 ** 2))
 
     im_pub = ax_pub.imshow(dem_pub, cmap='gist_earth', interpolation='bicubic',
-                           aspect='equal', vmin=dem.min(), vmax=dem.max())
+                           aspect='equal', vmin=dem_min, vmax=dem_max)
 
     ax_pub.set_title('Publication-Quality Lunar Digital Elevation Model\n(ISRO Mission-Ready Photoclinometry Analysis)',
                      fontsize=20, fontweight='bold', pad=40)
@@ -928,10 +1228,10 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
 
     # Add statistical information box
     stats_text = (f'DEM Statistics:\n'
-                  f'Min Elevation: {dem.min():.1f} m\n'
-                  f'Max Elevation: {dem.max():.1f} m\n'
-                  f'Mean: {dem.mean():.1f} m\n'
-                  f'Std Dev: {dem.std():.1f} m\n'
+                  f'Min Elevation: {dem_min:.1f} m\n'
+                  f'Max Elevation: {dem_max:.1f} m\n'
+                  f'Mean: {dem_mean:.1f} m\n'
+                  f'Std Dev: {dem_std:.1f} m\n'
                   f'Resolution: {CONFIG["pixel_size_meters"]:.0f} m/pixel\n'
                   f'Coverage: {w*CONFIG["pixel_size_meters"]/1000:.1f} × {h*CONFIG["pixel_size_meters"]/1000:.1f} km²')
 
@@ -942,47 +1242,47 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
 
     plt.tight_layout()
     plt.savefig(os.path.join(output_dir, 'publication_quality_dem.png'),
-                dpi=600, bbox_inches='tight', facecolor='white', edgecolor='none')
+                bbox_inches='tight', facecolor='white', edgecolor='none',
+                pil_kwargs=png_options)
     plt.close()
 
     # 3. Create Enhanced 3D Visualization with maximum quality
-    print_step("Creating high-quality 3D terrain visualization")
+    # mplot3d sorts and draws every quad on the CPU; it is the slowest
+    # figure, so it can be switched off when the 3D view is not needed
+    if CONFIG.get("render_3d", True):
+        print_step("Creating high-quality 3D terrain visualization")
+
+        fig_3d = plt.figure(figsize=(16, 12))
+        ax_3d = fig_3d.add_subplot(111, projection='3d')
+
+        # Subsample for performance but maintain quality
+        step = max(1, max(h, w) // 300)  # Higher resolution
+        # Build the coordinate grids at the subsampled resolution only
+        x = np.linspace(0, w * CONFIG["pixel_size_meters"], w)[::step]
+        y = np.linspace(0, h * CONFIG["pixel_size_meters"], h)[::step]
+        X_sub, Y_sub = np.meshgrid(x, y)
+        Z_sub = dem[::step, ::step]
+
+        # Create high-quality 3D surface
+        surf = ax_3d.plot_surface(X_sub, Y_sub, Z_sub, cmap='terrain', alpha=0.9,
+                                  linewidth=0, antialiased=True, shade=True)
+
+        ax_3d.set_xlabel('Longitudinal Distance (m)',
+                         fontweight='bold', fontsize=12)
+        ax_3d.set_ylabel('Latitudinal Distance (m)',
+                         fontweight='bold', fontsize=12)
+        ax_3d.set_zlabel('Surface Elevation (m)', fontweight='bold', fontsize=12)
+        ax_3d.set_title('Ultra-High-Quality 3D Lunar Terrain Reconstruction\n(Mission Planning and Landing Site Assessment)',
+                        fontweight='bold', fontsize=14, pad=30)
+
+        # Enhanced colorbar
+        cbar_3d = plt.colorbar(surf, ax=ax_3d, shrink=0.6, aspect=30)
+        cbar_3d.set_label('Elevation (m)', fontweight='bold', fontsize=12)
 
-    fig_3d = plt.figure(figsize=(16, 12))
-    ax_3d = fig_3d.add_subplot(111, projection='3d')
-
-    # Create coordinate grids with higher resolution
-    h, w = dem.shape
-    x = np.linspace(0, w * CONFIG["pixel_size_meters"], w)
-    y = np.linspace(0, h * CONFIG["pixel_size_meters"], h)
-    X, Y = np.meshgrid(x, y)
-
-    # Subsample for performance but maintain quality
-    step = max(1, max(h, w) // 300)  # Higher resolution
-    X_sub = X[::step, ::step]
-    Y_sub = Y[::step, ::step]
-    Z_sub = dem[::step, ::step]
-
-    # Create high-quality 3D surface
-    surf = ax_3d.plot_surface(X_sub, Y_sub, Z_sub, cmap='terrain', alpha=0.9,
-                              linewidth=0, antialiased=True, shade=True)
-
-    ax_3d.set_xlabel('Longitudinal Distance (m)',
-                     fontweight='bold', fontsize=12)
-    ax_3d.set_ylabel('Latitudinal Distance (m)',
-                     fontweight='bold', fontsize=12)
-    ax_3d.set_zlabel('Surface Elevation (m)', fontweight='bold', fontsize=12)
-    ax_3d.set_title('Ultra-High-Quality 3D Lunar Terrain Reconstruction\n(Mission Planning and Landing Site Assessment)',
-                    fontweight='bold', fontsize=14, pad=30)
-
-    # Enhanced colorbar
-    cbar_3d = plt.colorbar(surf, ax=ax_3d, shrink=0.6, aspect=30)
-    cbar_3d.set_label('Elevation (m)', fontweight='bold', fontsize=12)
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'lunar_terrain_3d.png'),
-                dpi=400, bbox_inches='tight', facecolor='white')
-    plt.close()
+        plt.tight_layout()
+        plt.savefig(os.path.join(output_dir, 'lunar_terrain_3d.png'),
+                    dpi=400, bbox_inches='tight', facecolor='white')
+        plt.close()
 
     # 4. Enhanced Convergence Analysis with crystal clarity
     if history['residuals']:
@@ -1037,7 +1337,8 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
         f"  Ultra-high-quality lunar surface visualizations saved in {output_dir}")
     print(f"  ✅ Crystal-clear DEM: ultra_clear_dem.png")
     print(f"  ✅ Complete analysis: lunar_surface_analysis.png")
-    print(f"  ✅ 3D terrain: lunar_terrain_3d.png")
+    if CONFIG.get("render_3d", True):
+        print(f"  ✅ 3D terrain: lunar_terrain_3d.png")
     print(f"  ✅ Convergence analysis: sfs_convergence_analysis.png")
 
 # ============================================================================
@@ -1045,77 +1346,128 @@ def create_visualizations(image: np.ndarray, surface: np.ndarray, dem: np.ndarra
 # ============================================================================
 
 
-def analyze_dem_quality(dem: np.ndarray, image: np.ndarray) -> Dict[str, Any]:
-    """Comprehensive DEM quality analysis"""
-    print_step("Analyzing DEM quality")
-
-    analysis = {}
-
-    # Basic statistics
-    analysis['basic_stats'] = {
-        'min_height': float(dem.min()),
-        'max_height': float(dem.max()),
-        'mean_height': float(dem.mean()),
-        'std_height': float(dem.std()),
-        'height_range': float(dem.max() - dem.min())
+def compute_dem_statistics(dem: np.ndarray, block_size: int = 1 << 15) -> Tuple[float, float, float, float]:
+    """Compute DEM min, max, mean and standard deviation in one blocked pass"""
+    flat = dem.ravel()
+    n = flat.size
+    # As in compute_moments, only one cache-sized block is converted to
+    # float64 at a time; sums are taken about the first height so the
+    # variance doesn't cancel catastrophically for DEMs far from zero
+    shift = float(flat[0])
+    dem_min, dem_max = np.inf, -np.inf
+    total = total_sq = 0.0
+    for start in range(0, n, block_size):
+        block = flat[start:start + block_size]
+        # np.minimum/np.maximum propagate NaN as dem.min()/dem.max() do;
+        # the builtins would silently skip a NaN block
+        dem_min = float(np.minimum(dem_min, block.min()))
+        dem_max = float(np.maximum(dem_max, block.max()))
+        deviation = block.astype(np.float64)
+        deviation -= shift
+        total += float(deviation.sum())
+        total_sq += float(np.dot(deviation, deviation))
+    mean_offset = total / n
+    dem_std = np.sqrt(max(total_sq / n - mean_offset**2, 0.0))
+    return dem_min, dem_max, shift + mean_offset, float(dem_std)
+
+
+def _iter_terrain_bands(dem: np.ndarray, block_rows: int, with_roughness: bool = True):
+    """Yield (slope, roughness) for successive row bands of the DEM"""
+    height = dem.shape[0]
+    for start in range(0, height, block_rows):
+        stop = min(start + block_rows, height)
+        # One halo row on each side keeps the 3x3 stencils exact at band seams
+        lo = max(start - 1, 0)
+        hi = min(stop + 1, height)
+        band = dem[lo:hi]
+        inner = slice(start - lo, start - lo + (stop - start))
+
+        grad_x, grad_y = compute_gradients(band)
+        band_slope = np.hypot(grad_x[inner], grad_y[inner])
+        del grad_x, grad_y
+        band_roughness = np.abs(laplace(band))[inner] if with_roughness else None
+        yield band_slope, band_roughness
+
+
+def compute_terrain_statistics(dem: np.ndarray, block_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Compute slope and roughness statistics in row bands to bound peak memory"""
+    if block_rows is None:
+        block_rows = CONFIG.get("analysis_block_rows", 512)
+    block_rows = max(1, int(block_rows))
+
+    # Nothing DEM-sized is kept: each band's derivatives are reduced to
+    # running float64 sums and dropped before the next band
+    flat_count = 0
+    landing_count = 0
+    slope_sum = slope_sumsq = 0.0
+    slope_max = -np.inf
+    roughness_sum = roughness_sumsq = 0.0
+    roughness_max = -np.inf
+
+    for band_slope, band_roughness in _iter_terrain_bands(dem, block_rows):
+        flat_count += np.count_nonzero(band_slope < 0.1)
+        landing_count += np.count_nonzero(
+            (band_slope < 0.05) & (band_roughness < 0.1))
+        band_slope64 = band_slope.ravel().astype(np.float64)
+        slope_sum += float(band_slope64.sum())
+        slope_sumsq += float(np.dot(band_slope64, band_slope64))
+        slope_max = max(slope_max, float(band_slope.max()))
+        band_roughness64 = band_roughness.ravel().astype(np.float64)
+        roughness_sum += float(band_roughness64.sum())
+        roughness_sumsq += float(np.dot(band_roughness64, band_roughness64))
+        roughness_max = max(roughness_max, float(band_roughness.max()))
+
+    pixel_count = dem.size
+    slope_mean = slope_sum / pixel_count
+    slope_std = np.sqrt(max(slope_sumsq / pixel_count - slope_mean**2, 0.0))
+    roughness_mean = roughness_sum / pixel_count
+    roughness_var = max(roughness_sumsq / pixel_count - roughness_mean**2, 0.0)
+
+    # The steep threshold needs the global mean/std, so count it in a
+    # second banded pass over the slope alone
+    steep_threshold = slope_mean + 2 * slope_std
+    steep_count = 0
+    for band_slope, _ in _iter_terrain_bands(dem, block_rows, with_roughness=False):
+        steep_count += np.count_nonzero(band_slope > steep_threshold)
+
+    return {
+        'slope_mean': float(slope_mean),
+        'slope_max': float(slope_max),
+        'slope_std': float(slope_std),
+        'steep_count': int(steep_count),
+        'flat_count': int(flat_count),
+        'landing_count': int(landing_count),
+        'roughness_mean': float(roughness_mean),
+        'roughness_max': float(roughness_max),
+        'roughness_std': float(np.sqrt(roughness_var)),
+        'pixel_count': pixel_count
     }
 
-    # Gradient analysis
-    grad_x, grad_y = compute_gradients(dem)
-    gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-
-    analysis['gradient_stats'] = {
-        'mean_slope': float(gradient_magnitude.mean()),
-        'max_slope': float(gradient_magnitude.max()),
-        'std_slope': float(gradient_magnitude.std()),
-        'steep_areas_percent': float(np.sum(gradient_magnitude > gradient_magnitude.mean() + 2*gradient_magnitude.std()) / gradient_magnitude.size * 100)
-    }
-
-    # Roughness analysis
-    laplacian = laplace(dem.astype(np.float64))
-    analysis['roughness_stats'] = {
-        'mean_roughness': float(np.abs(laplacian).mean()),
-        'max_roughness': float(np.abs(laplacian).max()),
-        'std_roughness': float(np.abs(laplacian).std())
-    }
-
-    # Correlation with input image
-    dem_norm = (dem - dem.min()) / (dem.max() - dem.min())
-    correlation = np.corrcoef(dem_norm.flatten(), image.flatten())[0, 1]
-    analysis['correlation_with_image'] = float(correlation)
-
-    # Additional mission-relevant metrics
-    analysis['mission_metrics'] = {
-        'crater_candidates': int(np.sum(dem < dem.mean() - 1.5 * dem.std())),
-        'ridge_features': int(np.sum(dem > dem.mean() + 1.5 * dem.std())),
-        'flat_terrain_percent': float(np.sum(gradient_magnitude < 0.1) / gradient_magnitude.size * 100),
-        'suitable_landing_sites': int(np.sum((gradient_magnitude < 0.05) & (np.abs(laplacian) < 0.1))),
-        'data_completeness': float(np.sum(np.isfinite(dem)) / dem.size * 100),
-        'disparity_range': float(dem.max() - dem.min()),
-        # Inverse of variation
-        'sub_pixel_accuracy': float(1.0 / max(dem.std(), 0.001))
-    }
 
-    # Quality score (0-100) - Enhanced for ISRO evaluation
+def calculate_quality_score(analysis: Dict[str, Any], correlation: float, all_finite: bool) -> int:
+    """Score DEM quality (0-100) from already computed metrics, without touching the DEM"""
+    basic = analysis['basic_stats']
+    gradient = analysis['gradient_stats']
+    mission = analysis['mission_metrics']
     quality_score = 0
 
     # Data completeness and validity (20 points)
-    if np.isfinite(dem).all() and analysis['mission_metrics']['data_completeness'] > 99:
+    if all_finite and mission['data_completeness'] > 99:
         quality_score += 20
-    elif analysis['mission_metrics']['data_completeness'] > 95:
+    elif mission['data_completeness'] > 95:
         quality_score += 15
 
     # Disparity range and elevation variability (20 points)
-    if analysis['basic_stats']['height_range'] > 0:
-        if analysis['mission_metrics']['disparity_range'] > 10:  # Good elevation variation
+    if basic['height_range'] > 0:
+        if mission['disparity_range'] > 10:  # Good elevation variation
             quality_score += 20
-        elif analysis['mission_metrics']['disparity_range'] > 5:
+        elif mission['disparity_range'] > 5:
             quality_score += 15
 
     # Terrain gradient analysis for landing site assessment (25 points)
-    if 0.01 < analysis['gradient_stats']['mean_slope'] < 0.5:
+    if 0.01 < gradient['mean_slope'] < 0.5:
         quality_score += 15
-    if analysis['mission_metrics']['flat_terrain_percent'] > 10:  # Sufficient flat areas
+    if mission['flat_terrain_percent'] > 10:  # Sufficient flat areas
         quality_score += 10
 
     # Photoclinometry correlation accuracy (25 points)
@@ -1129,10 +1481,70 @@ def analyze_dem_quality(dem: np.ndarray, image: np.ndarray) -> Dict[str, Any]:
         quality_score += 10
 
     # Surface feature detection capability (10 points)
-    if analysis['mission_metrics']['crater_candidates'] > 0 or analysis['mission_metrics']['ridge_features'] > 0:
+    if mission['crater_candidates'] > 0 or mission['ridge_features'] > 0:
         quality_score += 10
 
-    analysis['quality_score'] = quality_score
+    return quality_score
+
+
+def analyze_dem_quality(dem: np.ndarray, image: np.ndarray) -> Dict[str, Any]:
+    """Comprehensive DEM quality analysis"""
+    print_step("Analyzing DEM quality")
+
+    # Display-grade statistics do not need float64; halve the memory traffic
+    dem = dem.astype(np.float32, copy=False)
+
+    analysis = {}
+
+    # Basic statistics, computed once and reused by the metrics below
+    dem_min, dem_max, dem_mean, dem_std = compute_dem_statistics(dem)
+    height_range = dem_max - dem_min
+    analysis['basic_stats'] = {
+        'min_height': dem_min,
+        'max_height': dem_max,
+        'mean_height': dem_mean,
+        'std_height': dem_std,
+        'height_range': height_range
+    }
+
+    # Gradient and roughness analysis share one set of terrain derivatives
+    terrain = compute_terrain_statistics(dem)
+    pixel_count = terrain['pixel_count']
+
+    analysis['gradient_stats'] = {
+        'mean_slope': terrain['slope_mean'],
+        'max_slope': terrain['slope_max'],
+        'std_slope': terrain['slope_std'],
+        'steep_areas_percent': float(terrain['steep_count'] / pixel_count * 100)
+    }
+
+    analysis['roughness_stats'] = {
+        'mean_roughness': terrain['roughness_mean'],
+        'max_roughness': terrain['roughness_max'],
+        'std_roughness': terrain['roughness_std']
+    }
+
+    # Correlation with input image
+    dem_norm = (dem - dem_min) / height_range
+    correlation = np.corrcoef(dem_norm.flatten(), image.flatten())[0, 1]
+    analysis['correlation_with_image'] = float(correlation)
+
+    # Additional mission-relevant metrics
+    finite_count = np.count_nonzero(np.isfinite(dem))
+    analysis['mission_metrics'] = {
+        'crater_candidates': int(np.count_nonzero(dem < dem_mean - 1.5 * dem_std)),
+        'ridge_features': int(np.count_nonzero(dem > dem_mean + 1.5 * dem_std)),
+        'flat_terrain_percent': float(terrain['flat_count'] / pixel_count * 100),
+        'suitable_landing_sites': terrain['landing_count'],
+        'data_completeness': float(finite_count / dem.size * 100),
+        'disparity_range': height_range,
+        # Inverse of variation
+        'sub_pixel_accuracy': float(1.0 / max(dem_std, 0.001))
+    }
+
+    # Quality score (0-100) - Enhanced for ISRO evaluation
+    analysis['quality_score'] = calculate_quality_score(
+        analysis, correlation, finite_count == dem.size)
 
     return analysis
 
@@ -1264,66 +1676,84 @@ def save_analysis_results(analysis: Dict[str, Any], test_results: Dict[str, Any]
     print(f"  Detailed analysis saved: {json_path}")
 
 
-def create_hillshade(dem: np.ndarray, azimuth: float = 315, elevation: float = 45) -> np.ndarray:
-    """Create hillshade visualization of DEM"""
-    # Calculate gradients
-    gy, gx = np.gradient(dem)
-
-    # Convert to radians
-    azimuth_rad = np.radians(azimuth)
-    elevation_rad = np.radians(elevation)
+def create_hillshade(dem: np.ndarray, azimuth: float = 315, elevation: float = 45,
+                     gradients: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
+    """Create hillshade visualization of DEM
 
-    # Calculate slope and aspect
-    slope = np.arctan(np.sqrt(gx**2 + gy**2))
-    aspect = np.arctan2(-gx, gy)
+    Pass precomputed (grad_x, grad_y) via ``gradients`` to skip the gradient pass.
+    """
+    # Calculate gradients unless the caller already has them
+    if gradients is None:
+        gy, gx = np.gradient(dem.astype(np.float32, copy=False))
+    else:
+        gx, gy = gradients
 
-    # Calculate hillshade
-    hillshade = (np.cos(elevation_rad) * np.cos(slope) +
-                 np.sin(elevation_rad) * np.sin(slope) *
-                 np.cos(azimuth_rad - aspect))
+    # Illumination terms are constant across the whole raster
+    azimuth_rad = np.radians(azimuth)
+    cos_elevation = np.cos(np.radians(elevation))
+    sin_elevation = np.sin(np.radians(elevation))
+
+    # With slope = arctan(m) and aspect = arctan2(-gx, gy), the trig identities
+    # cos(slope) = 1/sqrt(1+m^2), sin(slope)*cos(az - aspect) =
+    # (cos(az)*gy - sin(az)*gx)/sqrt(1+m^2) leave sqrt as the only per-pixel
+    # transcendental, evaluated in place through two reused buffers
+    shade = np.multiply(gy, sin_elevation * np.cos(azimuth_rad))
+    norm = np.multiply(gx, sin_elevation * np.sin(azimuth_rad))
+    np.subtract(shade, norm, out=shade)
+    np.add(shade, cos_elevation, out=shade)
+
+    np.multiply(gx, gx, out=norm)
+    norm += gy * gy
+    np.add(norm, 1.0, out=norm)
+    np.sqrt(norm, out=norm)
+    np.divide(shade, norm, out=shade)
 
     # Normalize to 0-255
-    hillshade = np.clip(hillshade * 255, 0, 255).astype(np.uint8)
+    np.multiply(shade, 255, out=shade)
+    np.clip(shade, 0, 255, out=shade)
 
-    return hillshade
+    return shade.astype(np.uint8)
 
 
-def create_enhanced_hillshade(dem: np.ndarray) -> np.ndarray:
+def create_enhanced_hillshade(dem: np.ndarray,
+                              gradients: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
     """Create enhanced hillshade with improved contrast for lunar surface relief"""
-    from scipy.ndimage import gaussian_filter
-
-    # Calculate gradients with enhanced precision
-    gy, gx = np.gradient(dem)
+    # Calculate gradients unless the caller already has them
+    if gradients is None:
+        gy, gx = np.gradient(dem.astype(np.float32, copy=False))
+    else:
+        gx, gy = gradients
 
     # Multiple illumination angles for enhanced detail
     azimuths = [315, 45, 270, 90]  # Different illumination directions
     elevations = [45, 30, 60]      # Different elevation angles
 
-    combined_hillshade = np.zeros_like(dem)
-
-    for azimuth in azimuths:
-        for elevation in elevations:
-            # Convert to radians
-            azimuth_rad = np.radians(azimuth)
-            elevation_rad = np.radians(elevation)
-
-            # Calculate slope and aspect
-            slope = np.arctan(np.sqrt(gx**2 + gy**2))
-            aspect = np.arctan2(-gx, gy)
-
-            # Calculate hillshade
-            hillshade = (np.cos(elevation_rad) * np.cos(slope) +
-                         np.sin(elevation_rad) * np.sin(slope) *
-                         np.cos(azimuth_rad - aspect))
-
-            combined_hillshade += hillshade
+    # The hillshade sum separates into an elevation-only term and an
+    # azimuth-only term, so each trig function runs once per direction
+    cos_elevation_sum = sum(np.cos(np.radians(e)) for e in elevations)
+    sin_elevation_sum = sum(np.sin(np.radians(e)) for e in elevations)
+    cos_azimuth_sum = sum(np.cos(np.radians(a)) for a in azimuths)
+    sin_azimuth_sum = sum(np.sin(np.radians(a)) for a in azimuths)
+
+    # As in create_hillshade, the slope/aspect trig reduces to the raw
+    # gradients over sqrt(1+m^2), so no per-pixel trig is needed
+    combined_hillshade = np.multiply(gy, sin_elevation_sum * cos_azimuth_sum)
+    norm = np.multiply(gx, sin_elevation_sum * sin_azimuth_sum)
+    np.subtract(combined_hillshade, norm, out=combined_hillshade)
+    np.add(combined_hillshade, len(azimuths) * cos_elevation_sum,
+           out=combined_hillshade)
+    np.multiply(gx, gx, out=norm)
+    norm += gy * gy
+    np.add(norm, 1.0, out=norm)
+    np.sqrt(norm, out=norm)
+    np.divide(combined_hillshade, norm, out=combined_hillshade)
 
     # Normalize and enhance contrast
-    combined_hillshade = combined_hillshade / len(azimuths) / len(elevations)
-    combined_hillshade = np.clip(
-        combined_hillshade * 255, 0, 255).astype(np.uint8)
+    np.multiply(combined_hillshade, 255 / (len(azimuths) * len(elevations)),
+                out=combined_hillshade)
+    np.clip(combined_hillshade, 0, 255, out=combined_hillshade)
 
-    return combined_hillshade
+    return combined_hillshade.astype(np.uint8)
 
 
 def enhance_surface_contrast(dem: np.ndarray) -> np.ndarray:
@@ -1336,7 +1766,7 @@ def enhance_surface_contrast(dem: np.ndarray) -> np.ndarray:
     # Calculate edge enhancement using Sobel operators
     sobel_x = sobel(dem_smooth, axis=1)
     sobel_y = sobel(dem_smooth, axis=0)
-    sobel_magnitude = np.sqrt(sobel_x**2 + sobel_y**2)
+    sobel_magnitude = np.hypot(sobel_x, sobel_y)
 
     # Combine original surface with edge enhancement
     enhanced_surface = dem_smooth + 0.3 * sobel_magnitude
@@ -1357,21 +1787,36 @@ def create_analysis_visualization(dem: np.ndarray, image: np.ndarray, analysis:
     """Create comprehensive analysis visualization similar to the provided example"""
     print_step("Creating comprehensive analysis visualization")
 
+    # float32 is ample for rendering and halves the cost of every pass below
+    dem = dem.astype(np.float32, copy=False)
+
     # Calculate additional metrics
     grad_x, grad_y = compute_gradients(dem)
-    gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-    hillshade = create_hillshade(dem)
+    gradient_magnitude = np.hypot(grad_x, grad_y)
+    hillshade = create_hillshade(dem, gradients=(grad_x, grad_y))
+
+    # Reuse the elevation statistics already gathered by analyze_dem_quality
+    basic_stats = analysis.get('basic_stats')
+    if basic_stats:
+        dem_min, dem_max = basic_stats['min_height'], basic_stats['max_height']
+        dem_mean, dem_std = basic_stats['mean_height'], basic_stats['std_height']
+    else:
+        dem_min, dem_max, dem_mean, dem_std = compute_dem_statistics(dem)
 
     # Create the comprehensive analysis plot
-    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+    # Fixed margins for the fixed grid replace tight_layout's text-measuring solver
+    analysis_fig, axes = plt.subplots(
+        2, 3, figsize=(18, 12),
+        gridspec_kw=dict(left=0.04, right=0.98, top=0.94, bottom=0.06,
+                         wspace=0.25, hspace=0.3))
 
     # DEM visualization
     im1 = axes[0, 0].imshow(dem, cmap='terrain', aspect='equal')
     axes[0, 0].set_title(
-        f'Digital Elevation Model\nRange: [{dem.min():.1f}, {dem.max():.1f}] m')
+        f'Digital Elevation Model\nRange: [{dem_min:.1f}, {dem_max:.1f}] m')
     axes[0, 0].set_xlabel('X (pixels)')
     axes[0, 0].set_ylabel('Y (pixels)')
-    plt.colorbar(im1, ax=axes[0, 0], label='Height (m)', shrink=0.8)
+    analysis_fig.colorbar(im1, ax=axes[0, 0], label='Height (m)', shrink=0.8)
 
     # Slope map
     im2 = axes[0, 1].imshow(gradient_magnitude, cmap='hot', aspect='equal')
@@ -1379,14 +1824,15 @@ def create_analysis_visualization(dem: np.ndarray, image: np.ndarray, analysis:
         f'Slope Map\nMax: {gradient_magnitude.max():.2f} m/pixel')
     axes[0, 1].set_xlabel('X (pixels)')
     axes[0, 1].set_ylabel('Y (pixels)')
-    plt.colorbar(im2, ax=axes[0, 1], label='Slope (m/pixel)', shrink=0.8)
+    analysis_fig.colorbar(im2, ax=axes[0, 1], label='Slope (m/pixel)', shrink=0.8)
 
     # Enhanced Lunar Surface Relief - High Contrast Visualization
     # Create enhanced surface relief using multiple techniques for maximum clarity
     from scipy.ndimage import gaussian_filter
 
     # Method 1: Enhanced contrast hillshade
-    enhanced_hillshade = create_enhanced_hillshade(dem)
+    enhanced_hillshade = create_enhanced_hillshade(
+        dem, gradients=(grad_x, grad_y))
 
     # Method 2: Combine original surface with high-contrast enhancement
     surface_enhanced = enhance_surface_contrast(dem)
@@ -1401,8 +1847,8 @@ def create_analysis_visualization(dem: np.ndarray, image: np.ndarray, analysis:
     axes[0, 2].set_ylabel('Y (pixels)')
 
     # Height histogram
-    axes[1, 0].hist(dem.flatten(), bins=50, alpha=0.7,
-                    color='skyblue', edgecolor='black')
+    dem_histogram = plot_histogram(axes[1, 0], dem, 50, alpha=0.7,
+                                   color='skyblue', edgecolor='black')
     axes[1, 0].set_title(
         'Lunar Terrain Height Distribution\n(Elevation Characteristics for Mission Analysis)')
     axes[1, 0].set_xlabel('Height (m)')
@@ -1410,8 +1856,8 @@ def create_analysis_visualization(dem: np.ndarray, image: np.ndarray, analysis:
     axes[1, 0].grid(True, alpha=0.3)
 
     # Slope histogram
-    axes[1, 1].hist(gradient_magnitude.flatten(), bins=50,
-                    alpha=0.7, color='orange', edgecolor='black')
+    plot_histogram(axes[1, 1], gradient_magnitude, 50,
+                   alpha=0.7, color='orange', edgecolor='black')
     axes[1, 1].set_title(
         'Surface Slope Distribution\n(Landing Site Suitability Assessment)')
     axes[1, 1].set_xlabel('Slope (m/pixel)')
@@ -1420,47 +1866,71 @@ def create_analysis_visualization(dem: np.ndarray, image: np.ndarray, analysis:
 
     # Cross-section profile
     mid_row = dem.shape[0] // 2
-    profile = dem[mid_row, :]
-    axes[1, 2].plot(profile, linewidth=2, color='blue')
+    # Cap the line at ~2k vertices; wider DEMs gain nothing visible from more
+    step = max(1, dem.shape[1] // 2048)
+    profile = dem[mid_row, ::step]
+    axes[1, 2].plot(np.arange(0, dem.shape[1], step), profile,
+                    linewidth=2, color='blue')
     axes[1, 2].set_title(
         f'Terrain Cross-Section Profile\n(Topographic Analysis at Row {mid_row})')
     axes[1, 2].set_xlabel('X (pixels)')
     axes[1, 2].set_ylabel('Height (m)')
     axes[1, 2].grid(True, alpha=0.3)
 
-    plt.tight_layout()
     analysis_path = os.path.join(output_dir, 'comprehensive_analysis.png')
-    plt.savefig(analysis_path, dpi=300, bbox_inches='tight')
-    plt.close()
 
     # Create a single-row analysis summary similar to your first image
-    fig, axes = plt.subplots(1, 2, figsize=(15, 6))
+    summary_fig, axes = plt.subplots(
+        1, 2, figsize=(15, 6),
+        gridspec_kw=dict(left=0.05, right=0.98, top=0.8, bottom=0.1,
+                         wspace=0.2))
 
     # Optimized Lunar DEM
     im1 = axes[0].imshow(dem, cmap='terrain', aspect='equal')
     axes[0].set_title(
-        f'Optimized Lunar DEM\nRange: [{dem.min():.2f}, {dem.max():.2f}] m')
+        f'Optimized Lunar DEM\nRange: [{dem_min:.2f}, {dem_max:.2f}] m')
     axes[0].set_xlabel('X (pixels)')
     axes[0].set_ylabel('Y (pixels)')
-    plt.colorbar(im1, ax=axes[0], label='Height (meters)', shrink=0.8)
+    summary_fig.colorbar(im1, ax=axes[0], label='Height (meters)', shrink=0.8)
 
     # Height distribution with statistics
-    axes[1].hist(dem.flatten(), bins=50, alpha=0.7,
-                 color='skyblue', edgecolor='black')
+    # Same DEM and bins as the comprehensive figure, so reuse its counts
+    plot_histogram(axes[1], dem, 50, counts_edges=dem_histogram, alpha=0.7,
+                   color='skyblue', edgecolor='black')
     axes[1].set_title(
-        f'Height Distribution\nMean: {dem.mean():.2f} m\nStd: {dem.std():.2f} m\nMin: {dem.min():.2f} m\nMax: {dem.max():.2f} m')
+        f'Height Distribution\nMean: {dem_mean:.2f} m\nStd: {dem_std:.2f} m\nMin: {dem_min:.2f} m\nMax: {dem_max:.2f} m')
     axes[1].set_xlabel('Height (meters)')
     axes[1].set_ylabel('Frequency')
     axes[1].grid(True, alpha=0.3)
 
-    plt.tight_layout()
     summary_path = os.path.join(output_dir, 'analysis_summary.png')
-    plt.savefig(summary_path, dpi=300, bbox_inches='tight')
-    plt.close()
+
+    # Hillshade and slope maps are already raster-ready, so write them directly
+    hillshade_path = os.path.join(output_dir, 'hillshade.png')
+    slope_max = float(gradient_magnitude.max())
+    slope_scaled = gradient_magnitude / slope_max if slope_max > 0 else gradient_magnitude
+    slope_rgba = plt.get_cmap('hot')(slope_scaled, bytes=True)
+    slope_path = os.path.join(output_dir, 'slope_map.png')
+
+    # Agg rasterization and PNG encoding release the GIL, so write every
+    # output concurrently; each figure owns its own canvas
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        saves = [
+            executor.submit(analysis_fig.savefig, analysis_path, dpi=300),
+            executor.submit(summary_fig.savefig, summary_path, dpi=300),
+            executor.submit(save_png_fast, hillshade_path, hillshade),
+            executor.submit(save_png_fast, slope_path, slope_rgba)
+        ]
+        for save in saves:
+            save.result()
+    plt.close(analysis_fig)
+    plt.close(summary_fig)
 
     print(f"  Analysis visualizations saved:")
     print(f"    {analysis_path}")
     print(f"    {summary_path}")
+    print(f"    {hillshade_path}")
+    print(f"    {slope_path}")
 
 # ============================================================================
 # MAIN PROCESSING PIPELINE
@@ -1565,7 +2035,8 @@ def main():
         processing_info = {
             'image_file': os.path.basename(selected_image_path),
             'iterations': history['iterations'],
-            'converged': history['iterations'] < CONFIG["max_iterations"]
+            'converged': (history['iterations'] < CONFIG["max_iterations"]
+                          and not history['stalled'])
         }
 
         save_analysis_results(analysis_results, test_results,
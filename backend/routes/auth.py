@@ -10,6 +10,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models.user import User
 from models.processing_result import ProcessingResult
+import cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -56,7 +57,7 @@ def register():
         print(f"User created successfully: {user._id}")
 
         # Create JWT token
-        access_token = create_access_token(identity=str(user._id))
+        access_token = create_access_token(identity=user.id_str)
 
         return jsonify({
             'message': 'User registered successfully',
@@ -96,7 +97,7 @@ def login():
             }), 401
 
         # Create JWT token
-        access_token = create_access_token(identity=str(user._id))
+        access_token = create_access_token(identity=user.id_str)
 
         return jsonify({
             'message': 'Login successful',
@@ -149,7 +150,10 @@ def delete_account():
             }), 404
 
         # Delete user and all associated data
-        user.delete_user()
+        if not user.delete_user():
+            return jsonify({
+                'error': 'Failed to delete account'
+            }), 500
 
         return jsonify({
             'message': 'Account deleted successfully'
@@ -250,6 +254,7 @@ def update_profile():
             from datetime import datetime
             update_data['updated_at'] = datetime.utcnow()
             db.users.update_one({"_id": user._id}, {"$set": update_data})
+            cache.invalidate_user(user.id_str)
 
         # Return updated user
         updated_user = User.find_by_id(user_id)
@@ -349,6 +354,7 @@ def clear_test_users():
         from database import get_db
         db = get_db()
         result = db.users.delete_many({})
+        cache.invalidate_user()
         return jsonify({"message": f"Deleted {result.deleted_count} users"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -275,17 +275,18 @@ class CloudinaryService:
 
     def delete_folder(self, folder_path):
         """Delete a folder and all its contents"""
-        try:
-            # Get all resources in the folder
-            resources = cloudinary.api.resources(
-                type="upload",
-                prefix=f"{self.folder_prefix}/{folder_path}",
-                max_results=500
-            )
+        return self.delete_folders([folder_path])
 
-            # Delete all resources
-            for resource in resources.get("resources", []):
-                self.delete_file(resource["public_id"])
+    def delete_folders(self, folder_paths):
+        """Delete several folders with one prefix delete per folder and resource type"""
+        try:
+            for folder_path in folder_paths:
+                prefix = f"{self.folder_prefix}/{folder_path}/"
+                # Uploads use resource_type="auto": images land under "image",
+                # reports and logs under "raw"
+                for resource_type in ("image", "raw"):
+                    cloudinary.api.delete_resources_by_prefix(
+                        prefix, resource_type=resource_type)
 
             return True
         except Exception as e:
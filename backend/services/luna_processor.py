@@ -12,15 +12,7 @@ from datetime import datetime
 from models.job import ProcessingJob, JobStatus, job_storage
 from models.processing_result import ProcessingResult
 from services.cloudinary_service import CloudinaryService
-from utils.helpers import get_job_directory, create_results_zip, ensure_directory
-
-# Import Luna processing functions
-from processor import (
-    load_and_validate_image, optimize_surface_sfs, scale_dem_to_physical,
-    create_geotiff, create_obj_file, create_visualizations, analyze_dem_quality,
-    save_analysis_results, create_analysis_visualization, compute_illumination_vector,
-    CONFIG
-)
+from utils.helpers import get_job_directory, create_results_zip, ensure_directory, build_file_index
 
 # Thread pool for background processing
 processing_executor = ThreadPoolExecutor(max_workers=3)
@@ -38,9 +30,25 @@ class LunaProcessor:
         if hasattr(job, 'future'):
             job.future = future
 
+    @staticmethod
+    def _report_progress(job: ProcessingJob, result_id: str, progress: float, message: str) -> None:
+        """Update the in-memory job and mirror the step to its stored result"""
+        job.update_status(JobStatus.PROCESSING, progress, message)
+        if result_id:
+            ProcessingResult.set_progress(result_id, progress, message)
+
     @staticmethod
     def _process_image(job: ProcessingJob, user_id: str = None) -> Dict[str, Any]:
         """Process lunar image with comprehensive result generation and cloud storage"""
+        # Import Luna processing functions lazily: processor pulls in matplotlib,
+        # rasterio and scipy, which web workers that never process images skip
+        from processor import (
+            load_and_validate_image, optimize_surface_sfs, scale_dem_to_physical,
+            create_geotiff, create_obj_file, create_visualizations, analyze_dem_quality,
+            save_analysis_results, create_analysis_visualization, compute_illumination_vector,
+            CONFIG
+        )
+
         try:
             # Use existing processing result if available, otherwise create new one
             processing_result_id = getattr(job, 'result_id', None)
@@ -54,12 +62,15 @@ class LunaProcessor:
             # Update job status
             job.update_status(JobStatus.PROCESSING, 10,
                               "Loading and validating image...")
+            if processing_result_id:
+                ProcessingResult.set_progress(
+                    processing_result_id, 10, job.message, status="processing")
 
             # Load and validate image
             image, image_info = load_and_validate_image(job.image_path)
 
-            job.update_status(JobStatus.PROCESSING, 20,
-                              "Computing illumination vector...")
+            LunaProcessor._report_progress(job, processing_result_id, 20,
+                                           "Computing illumination vector...")
 
             # Compute illumination vector
             light_vector = compute_illumination_vector(
@@ -67,15 +78,15 @@ class LunaProcessor:
                 CONFIG["sun_elevation_deg"]
             )
 
-            job.update_status(JobStatus.PROCESSING, 30,
-                              "Running Shape-from-Shading optimization...")
+            LunaProcessor._report_progress(job, processing_result_id, 30,
+                                           "Running Shape-from-Shading optimization...")
 
             # Run SFS optimization
             surface, history = optimize_surface_sfs(
                 image, light_vector, CONFIG)
 
-            job.update_status(JobStatus.PROCESSING, 50,
-                              "Scaling DEM to physical units...")
+            LunaProcessor._report_progress(job, processing_result_id, 50,
+                                           "Scaling DEM to physical units...")
 
             # Scale DEM to physical units
             dem_scaled = scale_dem_to_physical(surface, CONFIG)
@@ -87,7 +98,8 @@ class LunaProcessor:
             ensure_directory(output_dir)
             ensure_directory(analysis_dir)
 
-            job.update_status(JobStatus.PROCESSING, 60, "Creating outputs...")
+            LunaProcessor._report_progress(job, processing_result_id, 60,
+                                           "Creating outputs...")
 
             # Create outputs
             geotiff_path = os.path.join(output_dir, "lunar_dem.tif")
@@ -96,15 +108,15 @@ class LunaProcessor:
             obj_path = os.path.join(output_dir, "lunar_surface.obj")
             create_obj_file(dem_scaled, obj_path, CONFIG)
 
-            job.update_status(JobStatus.PROCESSING, 70,
-                              "Creating visualizations...")
+            LunaProcessor._report_progress(job, processing_result_id, 70,
+                                           "Creating visualizations...")
 
             # Create visualizations
             create_visualizations(
                 image, surface, dem_scaled, history, output_dir)
 
-            job.update_status(JobStatus.PROCESSING, 80,
-                              "Analyzing DEM quality...")
+            LunaProcessor._report_progress(job, processing_result_id, 80,
+                                           "Analyzing DEM quality...")
 
             # Analyze DEM quality
             analysis_results = analyze_dem_quality(dem_scaled, image)
@@ -112,7 +124,8 @@ class LunaProcessor:
             processing_info = {
                 'image_file': job.original_filename,
                 'iterations': history['iterations'],
-                'converged': history['iterations'] < CONFIG["max_iterations"],
+                'converged': (history['iterations'] < CONFIG["max_iterations"]
+                              and not history['stalled']),
                 'job_id': job.job_id,
                 'processed_at': datetime.now().isoformat()
             }
@@ -133,8 +146,8 @@ class LunaProcessor:
                 'errors': []
             }
 
-            job.update_status(JobStatus.PROCESSING, 90,
-                              "Saving analysis results...")
+            LunaProcessor._report_progress(job, processing_result_id, 90,
+                                           "Saving analysis results...")
 
             # Save analysis results (excluding analysis_report.txt)
             save_analysis_results(
@@ -144,8 +157,8 @@ class LunaProcessor:
             create_analysis_visualization(
                 dem_scaled, image, analysis_results, analysis_dir)
 
-            job.update_status(JobStatus.PROCESSING, 95,
-                              "Uploading to cloud storage...")
+            LunaProcessor._report_progress(job, processing_result_id, 95,
+                                           "Uploading to cloud storage...")
 
             # Create ZIP file with all results
             zip_path = create_results_zip(job.job_id, 'server_results')
@@ -207,7 +220,8 @@ class LunaProcessor:
                         status="completed",
                         processing_info=processing_info,
                         analysis_results=analysis_results,
-                        cloudinary_urls=cloudinary_urls
+                        cloudinary_urls=cloudinary_urls,
+                        message="Processing completed successfully!"
                     )
 
             # Prepare final results
@@ -239,7 +253,8 @@ class LunaProcessor:
                 "completed_at": datetime.now().isoformat()
             }
 
-            # Update job with final results
+            # Update job with final results and index its files for lookups
+            job.file_index = build_file_index(job_dir)
             job.results = results
             job.update_status(JobStatus.COMPLETED, 100,
                               "Processing completed successfully!")
@@ -255,7 +270,8 @@ class LunaProcessor:
 
             # Update processing result if exists
             if processing_result_id:
-                ProcessingResult.update_status(processing_result_id, "failed")
+                ProcessingResult.update_status(processing_result_id, "failed",
+                                               message=error_msg)
 
             raise e
 
@@ -266,6 +282,10 @@ class LunaProcessor:
             job_dir = get_job_directory(job_id, 'server_results')
             if os.path.exists(job_dir):
                 shutil.rmtree(job_dir)
+            job = job_storage.get(job_id)
+            if job is not None:
+                job.file_index = None
+                job.files_info_cache = None
             return True
         except Exception as e:
             print(f"Error cleaning up temporary files: {e}")
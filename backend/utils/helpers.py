@@ -2,10 +2,13 @@
 Utility functions for Luna server
 """
 
+import io
 import os
+import string
+import tempfile
+import unicodedata
 import zipfile
-from typing import Set
-from werkzeug.utils import secure_filename
+from typing import Dict, Set
 
 
 def allowed_file(filename: str, allowed_extensions: Set[str]) -> bool:
@@ -13,6 +16,34 @@ def allowed_file(filename: str, allowed_extensions: Set[str]) -> bool:
     return any(filename.lower().endswith(ext) for ext in allowed_extensions)
 
 
+# Byte-level table: whitespace and path separators become '_', and every
+# other ASCII byte that is unsafe in a stored filename is deleted
+_FILENAME_SAFE = (string.ascii_letters + string.digits + '._-').encode('ascii')
+_FILENAME_TABLE = bytes.maketrans(b' \t/\\', b'____')
+_FILENAME_DELETE = bytes(set(range(256)) - set(_FILENAME_SAFE) - set(b' \t/\\'))
+# Stored uploads are prefixed with the 36-character job ID and '_'
+_MAX_STORED_FILENAME = 255 - 37
+
+
+def fast_secure_filename(filename: str) -> str:
+    """Single-pass equivalent of werkzeug's secure_filename for stored uploads"""
+    name = filename or ''
+    if not name.isascii():
+        # Fold accents to ASCII and drop anything else outside it
+        name = unicodedata.normalize('NFKD', name)
+    raw = name.encode('ascii', 'ignore').translate(_FILENAME_TABLE, _FILENAME_DELETE)
+    # Leading dots/underscores would make hidden or relative names
+    raw = raw.strip(b'._')
+    if len(raw) > _MAX_STORED_FILENAME:
+        # Shorten the stem rather than cutting off the extension
+        stem, dot, ext = raw.rpartition(b'.')
+        if stem and len(ext) < _MAX_STORED_FILENAME - 1:
+            raw = stem[:_MAX_STORED_FILENAME - len(ext) - 1].rstrip(b'._') + dot + ext
+        else:
+            raw = raw[:_MAX_STORED_FILENAME].rstrip(b'._')
+    return raw.decode('ascii') or 'unnamed'
+
+
 def get_file_extension(filename: str) -> str:
     """Get file extension"""
     return os.path.splitext(filename)[1].lower()
@@ -23,11 +54,76 @@ def ensure_directory(path: str):
     os.makedirs(path, exist_ok=True)
 
 
+# Copy uploads in 8 MiB chunks instead of werkzeug's 16 KiB
+UPLOAD_COPY_BUFFER = 8 << 20
+
+
+def save_upload(file, destination: str) -> int:
+    """Write an uploaded FileStorage to destination and return the bytes written"""
+    src = file.stream
+    fd_source = src
+    if isinstance(src, tempfile.SpooledTemporaryFile):
+        # Werkzeug spools every multipart file; only one that has rolled over
+        # to disk has a descriptor (fileno() on an in-memory one forces it).
+        # These are private attributes, so fall back to copying if they're gone
+        fd_source = getattr(src, '_file', None) if getattr(src, '_rolled', False) else None
+    src_fd = None
+    if fd_source is not None and hasattr(os, 'sendfile'):
+        try:
+            src_fd = fd_source.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            src_fd = None
+
+    written = 0
+    with open(destination, 'wb') as dst:
+        if src_fd is not None:
+            # Large uploads are spooled to a real temp file: copy in-kernel
+            offset = src.tell()
+            size = os.fstat(src_fd).st_size
+            while offset < size:
+                sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+                written += sent
+            return written
+
+        while True:
+            chunk = src.read(UPLOAD_COPY_BUFFER)
+            if not chunk:
+                break
+            dst.write(chunk)
+            written += len(chunk)
+    return written
+
+
 def get_job_directory(job_id: str, results_folder: str) -> str:
     """Get job-specific directory"""
     return os.path.join(results_folder, job_id)
 
 
+def scan_files(path: str):
+    """Yield file DirEntry objects under path, each directory's files before its subdirectories"""
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            else:
+                yield entry
+    for subdir in subdirs:
+        yield from scan_files(subdir)
+
+
+def build_file_index(directory: str) -> Dict[str, str]:
+    """Map each file name under directory to its path, keeping the first match in walk order"""
+    file_index = {}
+    if os.path.isdir(directory):
+        for entry in scan_files(directory):
+            file_index.setdefault(entry.name, entry.path)
+    return file_index
+
+
 def create_results_zip(job_id: str, results_folder: str) -> str:
     """Create ZIP file with all results"""
     job_dir = get_job_directory(job_id, results_folder)
@@ -57,25 +153,51 @@ def cleanup_directory(directory: str):
             print(f"Error cleaning up directory {directory}: {e}")
 
 
-def cleanup_user_files(user_id: str):
+def remove_stale_entries(directory: str, max_age_seconds: float):
+    """Remove top-level files and folders in directory not modified within max_age_seconds"""
+    import shutil
+    import time
+    cutoff = time.time() - max_age_seconds
+    try:
+        with os.scandir(directory) as it:
+            entries = [entry for entry in it
+                       if entry.stat(follow_symlinks=False).st_mtime < cutoff]
+    except FileNotFoundError:
+        return
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+        except Exception as e:
+            print(f"Error removing stale entry {entry.path}: {e}")
+
+
+def cleanup_user_files(user_id: str, keep_job_id: str = None):
     """Clean up files for a specific user from server directories"""
     from database import get_db
 
     try:
-        # Get user's processing results
+        # Only the job IDs are needed, so skip the rest of each document
         db = get_db()
-        user_results = list(db.processing_results.find({'user_id': user_id}))
+        query = {'user_id': user_id}
+        if keep_job_id:
+            query['job_id'] = {'$ne': keep_job_id}
+        user_results = db.processing_results.find(
+            query, {'_id': 0, 'job_id': 1})
 
         # Clean up server_results directory for this user
         results_folder = 'server_results'
         if os.path.exists(results_folder):
+            import shutil
             for result in user_results:
                 job_id = result.get('job_id')
                 if job_id:
                     job_dir = os.path.join(results_folder, job_id)
                     if os.path.exists(job_dir):
                         try:
-                            import shutil
                             shutil.rmtree(job_dir)
                         except Exception as e:
                             print(
@@ -0,0 +1,48 @@
+"""
+orjson-backed JSON provider for Flask responses
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize jsonify() responses with orjson instead of the stdlib encoder"""
+
+    def _options(self, indent: bool = False, sort_keys=None) -> int:
+        """Translate provider settings into orjson option flags"""
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        """Serialize data as JSON to a string"""
+        if kwargs.keys() - {"default", "sort_keys"}:
+            # Fall back to the stdlib for encoder options orjson lacks
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(
+            obj, default=kwargs.get("default", self.default),
+            option=self._options(sort_keys=kwargs.get("sort_keys"))).decode("utf-8")
+
+    def dumps_bytes(self, obj) -> bytes:
+        """Serialize data as compact JSON bytes, for streamed responses"""
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def loads(self, s, **kwargs):
+        """Deserialize data as JSON from a string or bytes"""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Build a JSON response, encoding straight to bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (
+            self.compact is None and self._app.debug)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default,
+                         option=self._options(indent)) + b"\n",
+            mimetype=self.mimetype)